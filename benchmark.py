@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import math
+import time
+import wave
+import random
+import shutil
+import struct
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARK_DIR = "benchmark_results"
+AUDIO_LENGTHS = "10,60"          # Seconds of synthetic audio per fixture
+WORKER_COUNTS = "1,4,N"          # N is the number of CPUs
+TRANSCRIPT_MB = "1,10"           # Sizes of the synthetic aggregated transcript files
+FACT_JOBS = 32                   # Transcripts sent through the fact-extraction fan-out
+MOCK_LLM_LATENCY = 0.2           # Seconds the mock OpenAI server waits before answering
+STUB_FETCH_LATENCY = 0.1         # Seconds the stub yt-dlp waits before answering
+SPEECHBRAIN_MODEL_DIR = os.path.join("test", "speechbrain_model")
+
+# Stand-in for yt-dlp: answers searches with canned records and "downloads" the fixture audio file
+STUB_YT_DLP = r'''#!{python}
+import os, sys, json, time, shutil, datetime
+args = sys.argv[1:]
+time.sleep(float(os.environ.get("BENCH_FETCH_LATENCY", "0")))
+fixture = os.environ["BENCH_FIXTURE_AUDIO"]
+if "-U" in args:
+    sys.exit(0)
+target = args[-1]
+if target.startswith("ytsearch"):
+    count = int(target.split(":", 1)[0].lstrip("ytsearchdate") or 1)
+    today = datetime.date.today().strftime("%Y%m%d")
+    for i in range(count):
+        print(json.dumps({{"id": f"bench{{i:05d}}", "title": f"Benchmark video {{i}}",
+                          "webpage_url": f"https://example.invalid/{{i}}", "upload_date": today,
+                          "duration": 600, "channel": "bench"}}), flush=True)
+    sys.exit(0)
+output = args[args.index("-o") + 1] if "-o" in args else "-"
+if output == "-":
+    with open(fixture, "rb") as f:
+        shutil.copyfileobj(f, sys.stdout.buffer)
+    sys.exit(0)
+path = output.replace("%(ext)s", "wav")
+shutil.copyfile(fixture, path)
+print(path)
+'''
+
+def write_synthetic_wav(path, seconds, sample_rate=16000, channels=1, seed=0):
+    """Writes speech-like audio: noise bursts with a syllable-rate envelope and a pause every few seconds."""
+    rng = random.Random(seed)
+    block_seconds = 10
+    frames = []
+    for n in range(block_seconds * sample_rate):
+        t = n / sample_rate
+        in_pause = (t % 5.0) > 4.4
+        envelope = 0.0 if in_pause else abs(math.sin(2 * math.pi * 4 * t))
+        value = int(envelope * rng.uniform(-1, 1) * 8000 + math.sin(2 * math.pi * 180 * t) * envelope * 4000)
+        frames.append(struct.pack("<h", max(-32768, min(32767, value))) * channels)
+    block = b"".join(frames)
+    repeats, remainder = divmod(int(seconds * sample_rate), block_seconds * sample_rate)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        for _ in range(repeats):
+            wf.writeframes(block)
+        wf.writeframes(block[:remainder * 2 * channels])
+    return path
+
+def write_synthetic_transcript(path, megabytes, words_per_video=3000, seed=0):
+    """Writes an aggregated transcript file of roughly `megabytes` MB in the '==== Video N (lang) ====' format."""
+    rng = random.Random(seed)
+    vocabulary = ["flat", "price", "sector", "metro", "project", "builder", "lakh", "crore", "rent", "launch",
+                  "noida", "possession", "amenities", "tower", "road", "investment", "market", "buyers"]
+    target = megabytes * 1024 * 1024
+    written = 0
+    idx = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            idx += 1
+            body = " ".join(rng.choice(vocabulary) for _ in range(words_per_video))
+            block = f"==== Video {idx} (en) ====\n{body}\n\n"
+            f.write(block)
+            written += len(block)
+    return idx
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers /chat/completions with a fixed facts list after MOCK_LLM_LATENCY seconds."""
+
+    latency = MOCK_LLM_LATENCY
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+        prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+        content = '{"facts": []}' if request.get("response_format") else (
+            "1. **Market Gossip & Buzz**\n- (Rumor) A new metro line is planned near Sector 150.\n"
+            "3. **Upcoming Projects**\n- A builder plans a 40-storey tower next year."
+        )
+        body = json.dumps({
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 60, "total_tokens": prompt_chars // 4 + 60},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_openai(latency=MOCK_LLM_LATENCY):
+    """Starts the mock OpenAI server on a free local port; returns (server, base_url)."""
+    MockOpenAIHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def write_stub_yt_dlp(directory):
+    """Writes the stub yt-dlp executable and returns its path."""
+    path = os.path.join(directory, "yt-dlp-stub")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(STUB_YT_DLP.format(python=sys.executable))
+    os.chmod(path, 0o755)
+    return path
+
+def _warm(_):
+    return os.getpid()
+
+def _convert(input_path):
+    import transcription
+    output = f"{input_path}.{os.getpid()}.{time.perf_counter_ns()}.wav"
+    if not transcription.convert_to_wav(input_path, output):
+        raise RuntimeError(f"convert_to_wav failed for {input_path}")
+    os.remove(output)
+
+def _identify(wav_path):
+    import transcription
+    return transcription.identify_language(wav_path, transcription._worker_language_id)
+
+def _transcribe(wav_path, model_dir):
+    import transcription
+    return transcription.transcribe_vosk(wav_path, model_dir)
+
+def _init_identify(model_dir):
+    import transcription
+    transcription.init_worker(model_dir)
+
+def run_parallel(func, jobs, workers, initializer=None, initargs=()):
+    """Runs func(*job) for every job on `workers` processes (warmed up first); returns the wall time."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        list(pool.map(_warm, range(workers)))
+        start = time.perf_counter()
+        list(pool.map(func, *zip(*jobs)))
+        return time.perf_counter() - start
+
+def result(benchmark, workers, wall, items, size=None, unit="items", amount=None):
+    """Builds one result record; throughput is `amount` (default: items) per second."""
+    amount = items if amount is None else amount
+    record = {"benchmark": benchmark, "size": size, "workers": workers, "items": items,
+              "wall_s": round(wall, 4), "unit": unit, "throughput": round(amount / wall, 4) if wall else None}
+    print(f"⏱️ {benchmark} size={size} workers={workers}: {wall:.2f}s, {record['throughput']} {unit}/s")
+    return record
+
+def bench_audio(args, fixtures_dir, workers_list, results):
+    """Benchmarks convert_to_wav, identify_language and transcribe_vosk on synthetic audio of each length."""
+    jobs_per_run = max(workers_list)
+
+    def measure(benchmark, seconds, workers, *run_args):
+        try:
+            wall = run_parallel(*run_args)
+        except Exception as e:
+            print(f"❌ {benchmark} size={seconds}s workers={workers} failed: {e}")
+            return
+        results.append(result(benchmark, workers, wall, jobs_per_run, f"{seconds}s", "audio_s", seconds * jobs_per_run))
+
+    for seconds in args.lengths:
+        source = write_synthetic_wav(os.path.join(fixtures_dir, f"source_{seconds}s.wav"), seconds, 44100, 2)
+        wav = write_synthetic_wav(os.path.join(fixtures_dir, f"mono_{seconds}s.wav"), seconds)
+        for workers in workers_list:
+            if "convert" in args.only:
+                measure("convert_to_wav", seconds, workers, _convert, [(source,)] * jobs_per_run, workers)
+            if "language_id" in args.only:
+                if os.path.exists(os.path.join(args.speechbrain_model, "hyperparams.yaml")):
+                    measure("identify_language", seconds, workers, _identify, [(wav,)] * jobs_per_run, workers,
+                            _init_identify, (args.speechbrain_model,))
+                elif workers == workers_list[0] and seconds == args.lengths[0]:
+                    print(f"⚠️ Skipping identify_language: no SpeechBrain model in {args.speechbrain_model}.")
+            if "transcribe" in args.only:
+                if args.vosk_model and os.path.isdir(args.vosk_model):
+                    measure("transcribe_vosk", seconds, workers, _transcribe, [(wav, args.vosk_model)] * jobs_per_run, workers)
+                elif workers == workers_list[0] and seconds == args.lengths[0]:
+                    print("⚠️ Skipping transcribe_vosk: pass --vosk-model with a small Vosk model directory.")
+
+def bench_transcript_reader(args, fixtures_dir, results):
+    """Benchmarks reading an aggregated transcript file into per-video transcripts."""
+    import blog_generation
+    for megabytes in args.transcript_mb:
+        path = os.path.join(fixtures_dir, f"transcript_{megabytes}mb.txt")
+        videos = write_synthetic_transcript(path, megabytes)
+        start = time.perf_counter()
+        transcripts = blog_generation.extract_video_transcripts(path)
+        wall = time.perf_counter() - start
+        if len(transcripts) != videos:
+            print(f"⚠️ Expected {videos} transcripts, read {len(transcripts)}.")
+        results.append(result("extract_video_transcripts", 1, wall, videos, f"{megabytes}MB", "MB", megabytes))
+
+def bench_fact_fanout(args, workers_list, results):
+    """Benchmarks extract_all_facts against the mock OpenAI server at each concurrency."""
+    import blog_generation
+    blog_generation.response_cache = None
+    transcript = " ".join(["the new metro line will raise prices in sector 150"] * 200)
+    jobs = [(transcript, "Noida")] * args.fact_jobs
+    for workers in workers_list:
+        start = time.perf_counter()
+        blog_generation.extract_all_facts(jobs, concurrency=workers, tokens_per_minute=0)
+        wall = time.perf_counter() - start
+        results.append(result("fact_extraction", workers, wall, len(jobs), f"{args.llm_latency}s latency", "videos"))
+
+def bench_fetch(args, fixtures_dir, workers_list, results):
+    """Benchmarks concurrent searches and audio downloads through the stub yt-dlp."""
+    import fetch
+    keywords = [f"City {i} real estate market" for i in range(max(workers_list) * 2)]
+    videos = [{"id": f"bench{i:05d}", "title": f"Benchmark video {i}", "webpage_url": f"https://example.invalid/{i}"}
+              for i in range(max(workers_list) * 2)]
+    for workers in workers_list:
+        start = time.perf_counter()
+        fetch.search_many(keywords, 20, concurrency=workers)
+        wall = time.perf_counter() - start
+        results.append(result("search", workers, wall, len(keywords), None, "searches"))
+
+        download_dir = os.path.join(fixtures_dir, f"downloads_{workers}")
+        start = time.perf_counter()
+        for _, path in fetch.prefetch_audio(videos, download_dir, concurrency=workers):
+            if path:
+                os.remove(path)
+        wall = time.perf_counter() - start
+        results.append(result("download", workers, wall, len(videos), None, "videos"))
+
+def compare(results, baseline_path):
+    """Prints each result's throughput change against a saved baseline run."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["benchmark"], r["size"], r["workers"]): r for r in json.load(f)["results"]}
+    print(f"\n📊 Compared with {baseline_path}")
+    print(f"{'benchmark':<28}{'size':>16}{'workers':>9}{'baseline':>12}{'now':>12}{'change':>9}")
+    for r in results:
+        old = baseline.get((r["benchmark"], r["size"], r["workers"]))
+        if not old or not old["throughput"] or not r["throughput"]:
+            continue
+        change = (r["throughput"] / old["throughput"] - 1) * 100
+        print(f"{r['benchmark']:<28}{str(r['size']):>16}{r['workers']:>9}{old['throughput']:>12.2f}"
+              f"{r['throughput']:>12.2f}{change:>+8.1f}%")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def parse_list(value, cast=int):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+def parse_args(argv=None):
+    """Parses command-line options for the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the transcription and generation hot paths.")
+    parser.add_argument("--only", default="convert,language_id,transcribe,reader,facts,fetch",
+                        help="Comma-separated benchmarks to run (default: all).")
+    parser.add_argument("--lengths", default=AUDIO_LENGTHS,
+                        help=f"Synthetic audio lengths in seconds (default: {AUDIO_LENGTHS}).")
+    parser.add_argument("--workers", default=WORKER_COUNTS,
+                        help=f"Worker counts to measure; N means all CPUs (default: {WORKER_COUNTS}).")
+    parser.add_argument("--transcript-mb", default=TRANSCRIPT_MB,
+                        help=f"Synthetic transcript file sizes in MB (default: {TRANSCRIPT_MB}).")
+    parser.add_argument("--fact-jobs", type=int, default=FACT_JOBS,
+                        help=f"Transcripts sent through the fact-extraction fan-out (default: {FACT_JOBS}).")
+    parser.add_argument("--llm-latency", type=float, default=MOCK_LLM_LATENCY,
+                        help=f"Mock OpenAI response delay in seconds (default: {MOCK_LLM_LATENCY}).")
+    parser.add_argument("--vosk-model", help="Small Vosk model directory for the transcribe_vosk benchmark.")
+    parser.add_argument("--speechbrain-model", default=SPEECHBRAIN_MODEL_DIR,
+                        help=f"Local SpeechBrain language-ID model directory (default: {SPEECHBRAIN_MODEL_DIR}).")
+    parser.add_argument("--output", help=f"Results file (default: {BENCHMARK_DIR}/<timestamp>.json).")
+    parser.add_argument("--baseline", help="Earlier results file to compare throughput against.")
+    args = parser.parse_args(argv)
+    cpus = os.cpu_count() or 1
+    args.only = set(parse_list(args.only, str.strip))
+    args.lengths = parse_list(args.lengths)
+    args.transcript_mb = parse_list(args.transcript_mb)
+    args.workers = sorted({cpus if w.strip().upper() == "N" else int(w) for w in args.workers.split(",") if w.strip()})
+    return args
+
+def main(argv=None):
+    """Runs the offline benchmarks and saves their results as JSON."""
+    args = parse_args(argv)
+    fixtures_dir = tempfile.mkdtemp(prefix="re-bench-")
+    print(f"🧪 Benchmark fixtures in {fixtures_dir}; worker counts {args.workers}")
+
+    # The stub yt-dlp and mock OpenAI endpoint must be configured before fetch/blog_generation are imported
+    server, base_url = start_mock_openai(args.llm_latency)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["YT_DLP_BIN"] = write_stub_yt_dlp(fixtures_dir)
+    os.environ["BENCH_FIXTURE_AUDIO"] = write_synthetic_wav(os.path.join(fixtures_dir, "fixture.wav"), 30)
+    os.environ["BENCH_FETCH_LATENCY"] = str(STUB_FETCH_LATENCY)
+
+    results = []
+    try:
+        benchmarks = [
+            ({"convert", "language_id", "transcribe"}, lambda: bench_audio(args, fixtures_dir, args.workers, results)),
+            ({"reader"}, lambda: bench_transcript_reader(args, fixtures_dir, results)),
+            ({"facts"}, lambda: bench_fact_fanout(args, args.workers, results)),
+            ({"fetch"}, lambda: bench_fetch(args, fixtures_dir, args.workers, results)),
+        ]
+        for names, run in benchmarks:
+            if not args.only & names:
+                continue
+            try:
+                run()
+            except Exception as e:  # Keep the results of the other benchmarks
+                print(f"❌ Benchmark {'/'.join(sorted(names))} failed: {e}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(fixtures_dir, ignore_errors=True)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    meta = {"created": datetime.datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"✅ Saved {len(results)} results to {output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
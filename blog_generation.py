@@ -1,37 +1,207 @@
 import os
-import re
-import pandas as pd
-from openai import OpenAI
+import time
+import asyncio
+import argparse
+from openai import OpenAI, AsyncOpenAI, RateLimitError
+try:
+    import tiktoken
+except ImportError:  # Optional: exact token counts; falls back to ~4 characters per token
+    tiktoken = None
+from llm_cache import LLMCache, cache_key, LLM_CACHE_DIR, LLM_CACHE_TTL_DAYS, LLM_CACHE_MAX_MB
+from fact_store import FactStore, FACT_CATEGORIES, FACT_STORE_PATH, parse_facts_json, dedupe_facts, format_facts
+from transcript_reader import iter_video_transcripts
+import instrumentation
+from instrumentation import span
 
 # API key (replace with your actual key)
 openai_api_key = "your-openai-api-key-here"
-client = OpenAI(api_key=openai_api_key)
+# Optional OpenAI-compatible endpoint, e.g. a local mock server for tests
+openai_base_url = os.environ.get("OPENAI_BASE_URL") or None
+client = OpenAI(api_key=openai_api_key, base_url=openai_base_url)
+async_client = AsyncOpenAI(api_key=openai_api_key, base_url=openai_base_url, max_retries=0)
+
+OPENAI_MODEL = "gpt-4o"
+FACT_CONCURRENCY = 8         # Max fact-extraction requests in flight at once
+TOKENS_PER_MINUTE = 30000    # Estimated token budget per minute (prompt + max_tokens), matching the account's TPM limit
+LLM_RETRIES = 5              # Attempts per request on 429 rate-limit errors
+LLM_BACKOFF_SECONDS = 2.0    # First retry delay; doubles on every further attempt
+TRANSCRIPT_CHUNK_TOKENS = 12000  # Longer transcripts are split into chunks of this size for extraction...
+CHUNK_OVERLAP_TOKENS = 300       # ...overlapping by this much so facts at a boundary are not lost
+MERGE_INPUT_TOKENS = 12000       # Max facts sent to one merge call
+BLOG_FACTS_TOKEN_BUDGET = 20000  # Facts beyond this are merged hierarchically before generate_blog
+
+response_cache = None        # LLMCache set up by main(); None disables caching
+
+def completion_tokens_used(completion, messages, max_tokens):
+    """Returns the tokens a completion cost, falling back to an estimate if usage is missing."""
+    usage = getattr(completion, "usage", None)
+    if usage and usage.total_tokens:
+        return usage.total_tokens
+    return estimate_tokens(messages) + max_tokens
 
 def call_openai_chat(messages, max_tokens=2000):
     """Calls OpenAI API for chat completion."""
+    key = cache_key(OPENAI_MODEL, messages, max_tokens)
+    if response_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            max_tokens=max_tokens,
-            stream=False
-        )
-        return completion.choices[0].message.content.strip()
+        with span("llm", model=OPENAI_MODEL, max_tokens=max_tokens) as metrics:
+            completion = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                max_tokens=max_tokens,
+                stream=False
+            )
+            metrics["tokens"] = completion_tokens_used(completion, messages, max_tokens)
+        content = completion.choices[0].message.content.strip()
+        if response_cache:
+            response_cache.put(key, content, completion_tokens_used(completion, messages, max_tokens))
+        return content
     except Exception as e:
         print(f"❌ API Error: {e}")
         return ""
 
+_encoding = None  # False once loading failed, so an offline run does not retry the download on every count
+
+def get_encoding():
+    """Returns the tiktoken encoding for OPENAI_MODEL, or None when tiktoken is not installed or cannot load it."""
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"⚠️ Could not load the tiktoken encoding ({e}); estimating ~4 characters per token.")
+            _encoding = False
+    return _encoding or None
+
+def count_tokens(text):
+    """Counts tokens with tiktoken when installed, otherwise estimates ~4 characters per token."""
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def estimate_tokens(messages):
+    """Estimates prompt tokens for a list of chat messages."""
+    return sum(count_tokens(m["content"]) for m in messages) + 4 * len(messages)
+
+def split_transcript(text, max_tokens=TRANSCRIPT_CHUNK_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    """Splits text into chunks of at most max_tokens that overlap by `overlap` tokens."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    step = max(max_tokens - overlap, 1)
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens) - overlap, step)]
+
+    words = text.split()
+    words_per_token = len(words) / count_tokens(text)
+    size, step = max(int(max_tokens * words_per_token), 1), max(int(step * words_per_token), 1)
+    return [" ".join(words[i:i + size]) for i in range(0, max(len(words) - (size - step), 1), step)]
+
+class TokenBudget:
+    """Async token-per-minute limiter: a bucket refilled continuously at the per-minute rate."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, tokens):
+        """Waits until `tokens` fit in the budget, then spends them."""
+        tokens = min(tokens, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) * 60 / self.capacity)
+
+async def call_openai_chat_async(messages, max_tokens=2000, semaphore=None, budget=None, response_format=None):
+    """Calls OpenAI API for chat completion without blocking, retrying 429s with backoff."""
+    key = cache_key(OPENAI_MODEL, messages, max_tokens, response_format)
+    extra = {"response_format": response_format} if response_format else {}
+    if response_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+    estimate = estimate_tokens(messages) + max_tokens
+    semaphore = semaphore or asyncio.Semaphore(1)
+    for attempt in range(1, LLM_RETRIES + 1):
+        async with semaphore:
+            if budget:
+                await budget.acquire(estimate)
+            try:
+                with span("llm", model=OPENAI_MODEL, max_tokens=max_tokens, attempt=attempt) as metrics:
+                    completion = await async_client.chat.completions.create(
+                        model=OPENAI_MODEL,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        stream=False,
+                        **extra
+                    )
+                    metrics["tokens"] = completion_tokens_used(completion, messages, max_tokens)
+                content = completion.choices[0].message.content.strip()
+                if response_cache:
+                    response_cache.put(key, content, completion_tokens_used(completion, messages, max_tokens))
+                return content
+            except RateLimitError as e:
+                retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = LLM_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                if attempt == LLM_RETRIES:
+                    print(f"❌ API Error: rate limited after {LLM_RETRIES} attempts: {e}")
+                    return ""
+                print(f"⚠️ Rate limited (attempt {attempt}/{LLM_RETRIES}); retrying in {delay:.0f}s...")
+            except Exception as e:
+                print(f"❌ API Error: {e}")
+                return ""
+        await asyncio.sleep(delay)
+    return ""
+
 def extract_video_transcripts(file_path):
     """Extracts individual video transcripts from a file."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-    pattern = r'====\s*Video\s*\d+(?:\s*\([^)]*\))?\s*===='
-    transcripts = [t.strip() for t in re.split(pattern, content) if t.strip()]
-    return transcripts
+    return [text for _, _, text in iter_video_transcripts(file_path) if text]
 
-def extract_facts(transcript, locality):
-    """Extracts real estate facts from a transcript."""
-    messages = [
+async def gather_jobs(extract, jobs, semaphore, budget, concurrency=FACT_CONCURRENCY):
+    """Starts extract(transcript, locality, ...) for each job as it is read; results keep the job order.
+
+    `jobs` may be a generator reading transcripts from disk. The next job is only pulled once one of
+    2 * concurrency slots is free, so at most that many transcripts are held in memory at a time.
+    """
+    slots = asyncio.Semaphore(2 * max(concurrency, 1))
+
+    async def run(transcript, locality):
+        try:
+            return await extract(transcript, locality, semaphore, budget)
+        finally:
+            slots.release()
+
+    jobs = iter(jobs)
+    tasks = []
+    while True:
+        await slots.acquire()
+        job = next(jobs, None)
+        if job is None:
+            break
+        tasks.append(asyncio.ensure_future(run(*job)))
+    return await asyncio.gather(*tasks)
+
+def fact_extraction_messages(transcript, locality):
+    """Builds the chat messages that extract real estate facts from a transcript."""
+    return [
         {
             "role": "system",
             "content": (
@@ -54,7 +224,135 @@ def extract_facts(transcript, locality):
         },
         {"role": "user", "content": transcript}
     ]
-    return call_openai_chat(messages, max_tokens=5000)
+
+def extract_facts(transcript, locality):
+    """Extracts real estate facts from a transcript."""
+    return call_openai_chat(fact_extraction_messages(transcript, locality), max_tokens=5000)
+
+async def extract_facts_async(transcript, locality, semaphore=None, budget=None):
+    """Extracts real estate facts from a transcript without blocking."""
+    return await call_openai_chat_async(fact_extraction_messages(transcript, locality), 5000, semaphore, budget)
+
+def structured_fact_extraction_messages(transcript, locality):
+    """Builds the chat messages that extract real estate facts from a transcript as JSON records."""
+    categories = "\n".join(f"{i}. {name}" for i, name in enumerate(FACT_CATEGORIES, start=1))
+    return [
+        {
+            "role": "system",
+            "content": (
+                f"Extract key real estate facts from the following YouTube video transcript about the {locality} market. "
+                'Respond with a JSON object {"facts": [...]}, where each fact is an object with the keys '
+                '"category" (one of the category names below), "fact" (concise, 1-2 sentences), "project_name", "builder", '
+                '"location", "price_range", "percentage_change" (use null when not mentioned) and "label" '
+                '("Fact", "Rumor" or "Opinion"; use "Rumor" or "Opinion" for speculative or unverified info).\n'
+                f"Categories:\n{categories}\n"
+                "Correct spelling errors and adapt to Indian real estate terms (e.g., developer/project names may vary slightly). "
+                f"Ignore generic real estate info not tied to {locality}. Return an empty list if no relevant data is found."
+            )
+        },
+        {"role": "user", "content": transcript}
+    ]
+
+async def extract_structured_facts_async(transcript, locality, semaphore=None, budget=None):
+    """Extracts JSON fact records from a transcript, chunk by chunk for oversized ones.
+
+    Returns None when a model call failed, so an API error is not mistaken for a transcript without facts.
+    """
+    chunks = split_transcript(transcript)
+    responses = await asyncio.gather(*(
+        call_openai_chat_async(structured_fact_extraction_messages(chunk, locality), 5000, semaphore, budget,
+                               response_format={"type": "json_object"})
+        for chunk in chunks
+    ))
+    if not all(responses):
+        return None
+    facts = [fact for response in responses for fact in parse_facts_json(response)]
+    return dedupe_facts(facts) if len(chunks) > 1 else facts
+
+def extract_all_structured_facts(jobs, concurrency=FACT_CONCURRENCY, tokens_per_minute=TOKENS_PER_MINUTE):
+    """Extracts fact records for every (transcript, locality) job concurrently; results keep the job order."""
+    async def run():
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        return await gather_jobs(extract_structured_facts_async, jobs, semaphore, budget, concurrency)
+    print(f"▶ Extracting structured facts ({concurrency} videos at a time)...")
+    return asyncio.run(run())
+
+def fact_merge_messages(facts_texts, locality):
+    """Builds the chat messages that merge several fact lists into one deduplicated list."""
+    categories = "\n".join(f"{i}. **{name}**" for i, name in enumerate(FACT_CATEGORIES, start=1))
+    return [
+        {
+            "role": "system",
+            "content": (
+                f"You merge lists of real estate facts about the {locality} market, extracted from different YouTube videos "
+                f"or parts of one video. Combine them into a single list using these categories:\n{categories}\n"
+                "Remove duplicate and near-duplicate facts, keeping the most specific version (project and builder names, "
+                "prices, percentages, dates). Keep 'Rumor' and 'Opinion' labels. Do not add information that is not in the lists. "
+                "Leave categories empty if no facts belong to them."
+            )
+        },
+        {"role": "user", "content": "\n\n".join(facts_texts)}
+    ]
+
+async def merge_facts_async(facts_texts, locality, semaphore=None, budget=None):
+    """Merges several fact lists into one; falls back to plain concatenation if the call fails."""
+    if len(facts_texts) == 1:
+        return facts_texts[0]
+    merged = await call_openai_chat_async(fact_merge_messages(facts_texts, locality), 5000, semaphore, budget)
+    return merged or "\n\n".join(facts_texts)
+
+def group_by_tokens(texts, max_tokens=MERGE_INPUT_TOKENS):
+    """Packs consecutive texts into groups of at most max_tokens (a single larger text gets its own group)."""
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def reduce_facts_async(facts_texts, locality, semaphore=None, budget=None,
+                             token_budget=BLOG_FACTS_TOKEN_BUDGET, max_rounds=5):
+    """Merges fact lists level by level, in parallel, until they fit in token_budget."""
+    if sum(count_tokens(text) for text in facts_texts) <= token_budget:
+        return "\n".join(facts_texts)
+    level = [text for text in facts_texts if text.strip()]
+    for _ in range(max_rounds):
+        if len(level) <= 1 or sum(count_tokens(text) for text in level) <= token_budget:
+            break
+        groups = group_by_tokens(level)
+        if len(groups) == len(level):
+            groups = [level[i:i + 2] for i in range(0, len(level), 2)]
+        print(f"🔀 Merging {len(level)} fact lists for {locality} into {len(groups)}...")
+        level = await asyncio.gather(*(merge_facts_async(group, locality, semaphore, budget) for group in groups))
+    return "\n".join(level)
+
+async def extract_chunked_facts_async(transcript, locality, semaphore=None, budget=None):
+    """Extracts facts from a transcript, splitting oversized ones into overlapping chunks merged afterwards.
+
+    Returns "" when any chunk's call failed, so a partial result is not recorded as the video's facts.
+    """
+    chunks = split_transcript(transcript)
+    if len(chunks) > 1:
+        print(f"✂️ Transcript for {locality} split into {len(chunks)} chunks.")
+    chunk_facts = await asyncio.gather(*(extract_facts_async(chunk, locality, semaphore, budget) for chunk in chunks))
+    if not all(chunk_facts):
+        return ""
+    return await reduce_facts_async(chunk_facts, locality, semaphore, budget, token_budget=0)
+
+def extract_all_facts(jobs, concurrency=FACT_CONCURRENCY, tokens_per_minute=TOKENS_PER_MINUTE):
+    """Extracts facts for every (transcript, locality) job concurrently; results keep the job order."""
+    async def run():
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        return await gather_jobs(extract_chunked_facts_async, jobs, semaphore, budget, concurrency)
+    print(f"▶ Extracting facts ({concurrency} videos at a time)...")
+    return asyncio.run(run())
 
 def generate_blog(extracted_facts_text, locality, last_no_of_days):
     """Generates a blog post from real estate facts."""
@@ -86,8 +384,93 @@ def generate_blog(extracted_facts_text, locality, last_no_of_days):
     ]
     return call_openai_chat(messages, max_tokens=16000)
 
-def main():
+async def prepare_city_facts_async(city, source, video_facts, fact_store=None, semaphore=None, budget=None):
+    """Formats a city's per-video facts for its facts file and condenses them for the blog prompt.
+
+    `video_facts` holds one facts text per video, or one list of fact records (None if extraction failed)
+    per video with a fact store.
+    `source` is the translated transcript file the facts came from. Returns (facts_text, blog_facts_text).
+    """
+    final_transcripts = []
+    indexed_facts = []
+    for idx, facts in enumerate(video_facts, start=1):
+        if fact_store:
+            facts = facts or []
+            indexed_facts.append((idx, facts))
+            facts = format_facts(facts)
+        final_transcripts.append(f"==== Video {idx} Facts ====\n{facts}\n")
+
+    if fact_store:
+        fact_store.replace_facts(city, source, indexed_facts)
+        city_facts = dedupe_facts([fact for _, facts in indexed_facts for fact in facts])
+        total = sum(len(facts) for _, facts in indexed_facts)
+        print(f"🧹 {total} facts for {city} collapsed to {len(city_facts)} after deduplication.")
+        blog_facts_text = format_facts(city_facts)
+        if count_tokens(blog_facts_text) > BLOG_FACTS_TOKEN_BUDGET:
+            blog_facts_text = await reduce_facts_async(blog_facts_text.split("\n\n"), city, semaphore, budget)
+    else:
+        blog_facts_text = await reduce_facts_async(final_transcripts, city, semaphore, budget)
+    return "\n".join(final_transcripts), blog_facts_text
+
+def prepare_city_facts(city, source, video_facts, fact_store=None, concurrency=FACT_CONCURRENCY,
+                       tokens_per_minute=TOKENS_PER_MINUTE):
+    """Runs prepare_city_facts_async on its own event loop."""
+    async def run():
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        return await prepare_city_facts_async(city, source, video_facts, fact_store, semaphore, budget)
+    return asyncio.run(run())
+
+def write_city_blog(city, days, source, facts_text, blog_facts_text, extracted_facts_dir, final_blog_dir):
+    """Saves a city's facts file, then generates and saves its blog; returns (facts_path, blog_path).
+
+    blog_path is "" when blog generation failed, and no blog file is written.
+    """
+    transcript_filename = os.path.basename(source).replace("_transcript.txt", "")
+    facts_path = os.path.join(extracted_facts_dir, f"{transcript_filename}_facts.txt")
+    with open(facts_path, "w", encoding="utf-8") as f:
+        f.write(facts_text)
+    print(f"✅ Saved facts to: {facts_path}")
+
+    print(f"▶ Generating blog for {city}...")
+    with span("blog", city=city):
+        final_blog = generate_blog(blog_facts_text, city, days)
+    if not final_blog:
+        print(f"❌ Blog generation failed for {city}.")
+        return facts_path, ""
+    blog_path = os.path.join(final_blog_dir, f"{transcript_filename}_blog.txt")
+    with open(blog_path, "w", encoding="utf-8") as f:
+        f.write(final_blog)
+    print(f"✅ Saved blog to: {blog_path}")
+    return facts_path, blog_path
+
+def parse_args(argv=None):
+    """Parses command-line options for the blog generation stage."""
+    parser = argparse.ArgumentParser(description="Extract facts from translated transcripts and generate blogs.")
+    parser.add_argument("--concurrency", type=int, default=FACT_CONCURRENCY,
+                        help=f"Max fact-extraction requests in flight across all cities (default: {FACT_CONCURRENCY}).")
+    parser.add_argument("--tokens-per-minute", type=int, default=TOKENS_PER_MINUTE,
+                        help=f"Estimated token budget per minute for fact extraction, 0 to disable (default: {TOKENS_PER_MINUTE}).")
+    parser.add_argument("--structured-facts", action="store_true",
+                        help="Extract facts as JSON records, index them in the fact store and deduplicate them across videos.")
+    parser.add_argument("--fact-store", default=FACT_STORE_PATH,
+                        help=f"SQLite fact store used with --structured-facts (default: {FACT_STORE_PATH}).")
+    parser.add_argument("--llm-cache-dir", default=LLM_CACHE_DIR,
+                        help=f"Directory of the LLM response cache (default: {LLM_CACHE_DIR}).")
+    parser.add_argument("--llm-cache-ttl-days", type=float, default=LLM_CACHE_TTL_DAYS,
+                        help=f"Cached responses older than this are requested again (default: {LLM_CACHE_TTL_DAYS}).")
+    parser.add_argument("--llm-cache-max-mb", type=float, default=LLM_CACHE_MAX_MB,
+                        help=f"Evict least recently used responses beyond this size (default: {LLM_CACHE_MAX_MB}).")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Always call the API, without reading or writing the response cache.")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Processes translated transcripts to generate real estate blogs."""
+    global response_cache
+    args = parse_args(argv)
+    instrumentation.setup(args)
     csv_path = "city_locality_list.csv"
     extracted_facts_dir = "extracted_facts"
     final_blog_dir = "final_blog"
@@ -97,59 +480,81 @@ def main():
     if not os.path.exists(csv_path):
         print(f"❌ CSV file not found: {csv_path}")
         return
+    import pandas as pd
     df = pd.read_csv(csv_path)
     required_columns = {"city", "days", "translated_path"}
     if not required_columns.issubset(df.columns):
         print(f"❌ CSV must contain {required_columns}.")
         return
 
+    if not args.no_llm_cache:
+        response_cache = LLMCache(args.llm_cache_dir, args.llm_cache_ttl_days, args.llm_cache_max_mb)
+    try:
+        generate_city_blogs(df, args, extracted_facts_dir, final_blog_dir)
+    finally:
+        if response_cache:
+            response_cache.evict()
+            response_cache.report()
+            response_cache.close()
+            response_cache = None
+    df.to_csv(csv_path, index=False)
+    print(f"✅ Updated CSV with new paths: {csv_path}")
+    instrumentation.print_summary()
+
+def generate_city_blogs(df, args, extracted_facts_dir, final_blog_dir):
+    """Extracts facts for every city's videos and writes each city's facts and blog files."""
+    city_videos = {}
+
+    def read_jobs():
+        """Yields (transcript, city) jobs while reading each city's translated file video by video."""
+        for index, row in df.iterrows():
+            city = row["city"]
+            translated_path = row["translated_path"]
+
+            if not translated_path or not os.path.exists(translated_path):
+                print(f"⚠️ Skipping row {index}: Translated path '{translated_path}' invalid.")
+                continue
+
+            videos = 0
+            for _, _, transcript in iter_video_transcripts(translated_path):
+                if transcript:
+                    videos += 1
+                    yield transcript, city
+            if videos:
+                city_videos[index] = videos
+            else:
+                print(f"❌ No valid transcripts found for {city}.")
+
+    if args.structured_facts:
+        all_facts = iter(extract_all_structured_facts(read_jobs(), args.concurrency, args.tokens_per_minute))
+        fact_store = FactStore(args.fact_store)
+    else:
+        all_facts = iter(extract_all_facts(read_jobs(), args.concurrency, args.tokens_per_minute))
+        fact_store = None
+
     extracted_facts_paths = []
     final_blog_paths = []
     for index, row in df.iterrows():
-        city = row["city"]
-        days = row["days"]
-        translated_path = row["translated_path"]
-
-        if not translated_path or not os.path.exists(translated_path):
-            print(f"⚠️ Skipping row {index}: Translated path '{translated_path}' invalid.")
+        if index not in city_videos:
             extracted_facts_paths.append("")
             final_blog_paths.append("")
             continue
-
-        transcripts = extract_video_transcripts(translated_path)
-        if not transcripts:
-            print(f"❌ No valid transcripts found for {city}.")
-            extracted_facts_paths.append("")
-            final_blog_paths.append("")
-            continue
-
-        final_transcripts = []
-        for idx, transcript in enumerate(transcripts, start=1):
-            print(f"▶ Processing Video {idx} for {city}...")
-            facts = extract_facts(transcript, city)
-            final_transcripts.append(f"==== Video {idx} Facts ====\n{facts}\n")
-
-        extracted_facts_text = "\n".join(final_transcripts)
-        transcript_filename = os.path.basename(translated_path).replace("_transcript.txt", "")
-        facts_path = os.path.join(extracted_facts_dir, f"{transcript_filename}_facts.txt")
-        with open(facts_path, "w", encoding="utf-8") as f:
-            f.write(extracted_facts_text)
-        print(f"✅ Saved facts to: {facts_path}")
-
-        print(f"▶ Generating blog for {city}...")
-        final_blog = generate_blog(extracted_facts_text, city, days)
-        blog_path = os.path.join(final_blog_dir, f"{transcript_filename}_blog.txt")
-        with open(blog_path, "w", encoding="utf-8") as f:
-            f.write(final_blog)
-        print(f"✅ Saved blog to: {blog_path}")
-
+        city = row["city"]
+        translated_path = row["translated_path"]
+        video_facts = [next(all_facts) for _ in range(city_videos[index])]
+        facts_text, blog_facts_text = prepare_city_facts(
+            city, translated_path, video_facts, fact_store, args.concurrency, args.tokens_per_minute
+        )
+        facts_path, blog_path = write_city_blog(
+            city, row["days"], translated_path, facts_text, blog_facts_text, extracted_facts_dir, final_blog_dir
+        )
         extracted_facts_paths.append(facts_path)
         final_blog_paths.append(blog_path)
 
+    if fact_store:
+        fact_store.close()
     df["extracted_facts_path"] = extracted_facts_paths
     df["final_blog_path"] = final_blog_paths
-    df.to_csv(csv_path, index=False)
-    print(f"✅ Updated CSV with new paths: {csv_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+FACT_STORE_PATH = os.path.join("cache", "facts.sqlite3")
+FACT_CATEGORIES = [
+    "Market Gossip & Buzz",
+    "New Projects Launched",
+    "Upcoming Projects",
+    "Price Changes in Existing Projects & Localities",
+    "Infrastructure Developments",
+    "Government Policies & Regulations",
+    "Builder & Developer News",
+    "Housing Trends (Luxury vs. Affordable)",
+    "Market Overview & Comparisons",
+    "Expert Opinions & Market Predictions",
+]
+FACT_FIELDS = ("category", "fact", "project_name", "builder", "location", "price_range", "percentage_change", "label")
+FACT_LABELS = ("Fact", "Rumor", "Opinion")
+DUPLICATE_SIMILARITY = 0.7   # Word-set Jaccard similarity above which two facts in a category are near-duplicates
+
+def normalize_category(category):
+    """Maps a category name or number returned by the model onto FACT_CATEGORIES (None if unknown)."""
+    text = str(category or "").strip()
+    if text.isdigit() and 1 <= int(text) <= len(FACT_CATEGORIES):
+        return FACT_CATEGORIES[int(text) - 1]
+    key = re.sub(r"[^a-z]", "", text.lower())
+    for name in FACT_CATEGORIES:
+        if re.sub(r"[^a-z]", "", name.lower()) == key:
+            return name
+    for name in FACT_CATEGORIES:
+        if key and key in re.sub(r"[^a-z]", "", name.lower()):
+            return name
+    return None
+
+def parse_facts_json(text):
+    """Parses a model response of the form {"facts": [...]} into validated fact records."""
+    if not text:
+        return []
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    try:
+        data = json.loads(match.group(0) if match else text)
+    except ValueError:
+        print("⚠️ Could not parse structured facts; skipping response.")
+        return []
+    items = data.get("facts", []) if isinstance(data, dict) else data
+    facts = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or not str(item.get("fact") or "").strip():
+            continue
+        category = normalize_category(item.get("category"))
+        if category is None:
+            continue
+        record = {field: (str(item[field]).strip() if item.get(field) not in (None, "") else None) for field in FACT_FIELDS}
+        record["category"] = category
+        record["label"] = record["label"] if record["label"] in FACT_LABELS else "Fact"
+        facts.append(record)
+    return facts
+
+def _words(text):
+    return set(re.findall(r"\w+", (text or "").lower()))
+
+def is_near_duplicate(a, b, threshold=DUPLICATE_SIMILARITY):
+    """Returns True if two facts of the same category say essentially the same thing."""
+    if a["category"] != b["category"]:
+        return False
+    for field in ("project_name", "price_range", "percentage_change"):
+        if a.get(field) and b.get(field) and a[field].lower() != b[field].lower():
+            return False
+    words_a, words_b = _words(a["fact"]), _words(b["fact"])
+    if not words_a or not words_b:
+        return False
+    return len(words_a & words_b) / len(words_a | words_b) >= threshold
+
+def dedupe_facts(facts):
+    """Collapses near-duplicate facts, keeping the most detailed version and counting its sources."""
+    kept = []
+    for fact in facts:
+        fact = dict(fact, sources=fact.get("sources", 1))
+        for i, existing in enumerate(kept):
+            if is_near_duplicate(existing, fact):
+                richer = max(existing, fact, key=lambda f: (sum(1 for k in FACT_FIELDS if f.get(k)), len(f["fact"])))
+                kept[i] = dict(richer, sources=existing["sources"] + fact["sources"])
+                break
+        else:
+            kept.append(fact)
+    return kept
+
+def format_facts(facts):
+    """Renders facts as a compact markdown list grouped by category, in the extraction prompt's order."""
+    lines = []
+    for number, category in enumerate(FACT_CATEGORIES, start=1):
+        in_category = [f for f in facts if f["category"] == category]
+        if not in_category:
+            continue
+        lines.append(f"{number}. **{category}**")
+        for fact in in_category:
+            details = [f"{field.replace('_', ' ')}: {fact[field]}"
+                       for field in ("project_name", "builder", "location", "price_range", "percentage_change")
+                       if fact.get(field)]
+            label = f"({fact['label']}) " if fact.get("label") and fact["label"] != "Fact" else ""
+            suffix = f" [{'; '.join(details)}]" if details else ""
+            sources = f" (mentioned {fact['sources']} times)" if fact.get("sources", 1) > 1 else ""
+            lines.append(f"- {label}{fact['fact']}{suffix}{sources}")
+        lines.append("")
+    return "\n".join(lines).strip()
+
+class FactStore:
+    """SQLite index of structured facts per locality and source video; safe to share between threads."""
+
+    def __init__(self, path=FACT_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS facts (
+                id INTEGER PRIMARY KEY,
+                locality TEXT NOT NULL,
+                source TEXT NOT NULL,
+                video_index INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                fact TEXT NOT NULL,
+                project_name TEXT,
+                builder TEXT,
+                location TEXT,
+                price_range TEXT,
+                percentage_change TEXT,
+                label TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS facts_locality ON facts (locality COLLATE NOCASE, category)")
+        self.conn.commit()
+
+    def replace_facts(self, locality, source, video_facts):
+        """Replaces all facts recorded for one source file with [(video_index, facts)]."""
+        with self.lock:
+            self.conn.execute("DELETE FROM facts WHERE locality = ? AND source = ?", (locality, source))
+            now = time.time()
+            self.conn.executemany(
+                f"INSERT INTO facts (locality, source, video_index, {', '.join(FACT_FIELDS)}, created_at) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(FACT_FIELDS))}, ?)",
+                [
+                    (locality, source, video_index, *(fact.get(field) for field in FACT_FIELDS), now)
+                    for video_index, facts in video_facts
+                    for fact in facts
+                ],
+            )
+            self.conn.commit()
+
+    def query(self, locality, category=None):
+        """Returns stored facts for a locality (optionally one category), in insertion order."""
+        sql = f"SELECT video_index, {', '.join(FACT_FIELDS)} FROM facts WHERE locality = ? COLLATE NOCASE"
+        params = [locality]
+        if category:
+            sql += " AND category = ?"
+            params.append(normalize_category(category) or category)
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY id", params).fetchall()
+        return [dict(zip(("video_index",) + FACT_FIELDS, row)) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+def main(argv=None):
+    """Prints the deduplicated facts stored for a locality, without calling the LLM."""
+    parser = argparse.ArgumentParser(description="Query structured real estate facts for a locality.")
+    parser.add_argument("locality", help="City or locality name as it appears in city_locality_list.csv.")
+    parser.add_argument("--category", help="Only show this category (name or number 1-10).")
+    parser.add_argument("--db", default=FACT_STORE_PATH, help=f"Fact store path (default: {FACT_STORE_PATH}).")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"❌ Fact store not found: {args.db}")
+        return
+    store = FactStore(args.db)
+    try:
+        facts = dedupe_facts(store.query(args.locality, args.category))
+    finally:
+        store.close()
+    if not facts:
+        print(f"❌ No facts stored for {args.locality}.")
+        return
+    print(format_facts(facts))
+
+if __name__ == "__main__":
+    main()
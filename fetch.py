@@ -0,0 +1,218 @@
+import os
+import json
+import queue
+import asyncio
+import hashlib
+import datetime
+import threading
+from instrumentation import span
+
+YT_DLP = os.environ.get("YT_DLP_BIN", "yt-dlp")  # Point at a local stand-in to serve canned JSON/audio in tests
+SEARCH_CONCURRENCY = 4      # Max yt-dlp searches running at once
+DOWNLOAD_CONCURRENCY = 3    # Max yt-dlp audio downloads running at once
+FETCH_RETRIES = 3           # Attempts per yt-dlp call before giving up
+RETRY_BACKOFF_SECONDS = 2.0 # First retry delay; doubles on every further attempt
+SEARCH_FIELDS = ("id", "title", "webpage_url", "upload_date", "duration", "channel")
+SEARCH_STOP_AFTER_OLD = 3   # Date-ordered searches stop after this many consecutive too-old results
+
+_DONE = object()
+
+async def run_yt_dlp(args, retries=FETCH_RETRIES, backoff=RETRY_BACKOFF_SECONDS):
+    """Runs yt-dlp without blocking the event loop, retrying with exponential backoff; returns stdout or None."""
+    message = ""
+    for attempt in range(1, retries + 1):
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                YT_DLP, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await proc.communicate()
+            if proc.returncode == 0:
+                return stdout.decode("utf-8", errors="replace")
+            lines = stderr.decode("utf-8", errors="replace").strip().splitlines()
+            message = lines[-1] if lines else f"exit code {proc.returncode}"
+        except OSError as e:
+            message = str(e)
+        if attempt < retries:
+            delay = backoff * 2 ** (attempt - 1)
+            print(f"⚠️ yt-dlp failed (attempt {attempt}/{retries}): {message}. Retrying in {delay:.0f}s...")
+            await asyncio.sleep(delay)
+    print(f"❌ yt-dlp failed after {retries} attempts: {message}")
+    return None
+
+def search_args(keyword, max_results, by_date=False):
+    """Builds yt-dlp arguments that print one minimal JSON record per search result."""
+    prefix = "ytsearchdate" if by_date else "ytsearch"
+    return [
+        "--ignore-errors", "--no-warnings",
+        "--print", "%(.{" + ",".join(SEARCH_FIELDS) + "})j",
+        f"{prefix}{max_results}:{keyword}"
+    ]
+
+def search_cutoff(days):
+    """Returns the oldest accepted upload date as a YYYYMMDD integer, or None for no date limit."""
+    if days is None:
+        return None
+    return int((datetime.datetime.now() - datetime.timedelta(days=days)).strftime("%Y%m%d"))
+
+def classify_search_result(vid, cutoff, min_duration):
+    """Returns 'keep', 'skip' (too short/undated) or 'old' (uploaded before the cutoff) for a search result.
+
+    The date is checked first, so an old Short still counts towards the early stop.
+    """
+    if cutoff is not None:
+        try:
+            upload_date = int(vid.get("upload_date") or "")
+        except ValueError:
+            return "skip"
+        if upload_date < cutoff:
+            return "old"
+    return "keep" if (vid.get("duration") or 0) >= min_duration else "skip"
+
+async def search_async(keyword, max_results, semaphore, days=None, min_duration=0,
+                       retries=FETCH_RETRIES, backoff=RETRY_BACKOFF_SECONDS):
+    """Streams a YouTube search once a slot is free, filtering each record as it arrives.
+
+    With `days`, results are requested newest first and the search stops as soon as they fall
+    outside the window. A search that fails before printing any result is retried with backoff.
+    """
+    cutoff = search_cutoff(days)
+    args = search_args(keyword, max_results, by_date=cutoff is not None)
+    async with semaphore:
+        print(f"🔎 Searching YouTube for '{keyword}' (max {max_results} results)...")
+        with span("search", keyword=keyword) as metrics:
+            for attempt in range(1, retries + 1):
+                videos, seen, old_streak, stopped = [], 0, 0, False
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        YT_DLP, *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                    )
+                except OSError as e:
+                    message = str(e)
+                else:
+                    # stderr is drained alongside stdout so a chatty yt-dlp cannot block on a full pipe
+                    errors = asyncio.ensure_future(proc.stderr.read())
+                    completed = False
+                    try:
+                        async for line in proc.stdout:
+                            try:
+                                vid = json.loads(line)
+                            except ValueError:
+                                continue
+                            seen += 1
+                            status = classify_search_result(vid, cutoff, min_duration)
+                            if status == "keep":
+                                videos.append(vid)
+                            if status != "skip":  # Undated or short results say nothing about the date window
+                                old_streak = old_streak + 1 if status == "old" else 0
+                            if old_streak >= SEARCH_STOP_AFTER_OLD:
+                                stopped = True
+                                break
+                        completed = True
+                    finally:
+                        if proc.returncode is None and (stopped or not completed):
+                            proc.terminate()
+                        await proc.wait()
+                        stderr = (await errors).decode("utf-8", errors="replace")
+                    if seen or stopped or proc.returncode == 0:
+                        break
+                    lines = stderr.strip().splitlines()
+                    message = lines[-1] if lines else f"exit code {proc.returncode}"
+                if attempt < retries:
+                    delay = backoff * 2 ** (attempt - 1)
+                    print(f"⚠️ Search for '{keyword}' failed (attempt {attempt}/{retries}): {message}. "
+                          f"Retrying in {delay:.0f}s...")
+                    await asyncio.sleep(delay)
+                else:
+                    print(f"❌ Error running yt-dlp search for '{keyword}': {message}")
+                    metrics["error"] = "yt-dlp"
+                    return []
+            metrics["results"] = len(videos)
+    note = ", stopped early at the date window" if stopped else ""
+    print(f"✅ Kept {len(videos)} of {seen} results for '{keyword}'{note}.")
+    return videos
+
+def search_many(keywords, max_results=10, concurrency=SEARCH_CONCURRENCY, days=None, min_duration=0):
+    """Searches several keywords concurrently; returns one result list per keyword, in order.
+
+    `days` may be a single value or one value per keyword.
+    """
+    days_list = days if isinstance(days, (list, tuple)) else [days] * len(keywords)
+
+    async def run():
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+        return await asyncio.gather(*(
+            search_async(keyword, max_results, semaphore, keyword_days, min_duration)
+            for keyword, keyword_days in zip(keywords, days_list)
+        ))
+    return asyncio.run(run())
+
+async def download_async(video_data, output_dir):
+    """Downloads a video's best audio stream as-is (no MP3 re-encode); returns the file path or None."""
+    webpage_url = video_data.get("webpage_url")
+    if not webpage_url:
+        print("❌ No webpage_url found; skipping.")
+        return None
+    name = video_data.get("id") or hashlib.sha1(webpage_url.encode("utf-8")).hexdigest()
+    output_template = os.path.join(output_dir, f"{name}.%(ext)s")
+    print(f"📥 Downloading audio for {video_data.get('title')}...")
+    with span("download", video=video_data.get("id")):
+        stdout = await run_yt_dlp([
+            "-f", "bestaudio", "--no-progress", "--no-simulate",
+            "--print", "after_move:filepath",
+            "-o", output_template,
+            webpage_url
+        ])
+    lines = stdout.strip().splitlines() if stdout else []
+    path = lines[-1] if lines else None
+    if path and os.path.exists(path):
+        print(f"✅ Audio downloaded: {path}")
+        return path
+    print(f"❌ Download failed for {video_data.get('title')}.")
+    return None
+
+def prefetch_audio(videos, output_dir, concurrency=DOWNLOAD_CONCURRENCY, max_pending=None):
+    """Downloads videos on a background event loop and yields (video, audio_path) as each one finishes.
+
+    At most `max_pending` finished files wait for the consumer, so downloads overlap with CPU-bound
+    transcription without filling the disk. audio_path is None for failed downloads.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = queue.Queue(maxsize=max(max_pending or concurrency, 1))
+    stop = threading.Event()
+
+    async def fetch_all():
+        semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+        async def fetch(vid):
+            async with semaphore:
+                if stop.is_set():
+                    return
+                path = await download_async(vid, output_dir)
+                await asyncio.to_thread(results.put, (vid, path))
+
+        await asyncio.gather(*(fetch(vid) for vid in videos))
+
+    def producer():
+        try:
+            asyncio.run(fetch_all())
+        finally:
+            results.put(_DONE)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        while thread.is_alive() or not results.empty():
+            try:
+                item = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is not _DONE and item[1] and os.path.exists(item[1]):
+                os.remove(item[1])
+        thread.join()
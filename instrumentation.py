@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import argparse
+import threading
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then left out of the spans
+    resource = None
+
+METRICS_ENV = "RE_METRICS_PATH"     # JSON-lines file spans are appended to; unset disables instrumentation
+PROFILE_ENV = "RE_PROFILE_STAGES"   # Comma-separated stages to run under cProfile
+RUN_ENV = "RE_METRICS_RUN"          # Id shared by the spans of one run, including its worker processes
+PROFILE_DIR = "profiles"
+
+_lock = threading.Lock()
+_profile_count = 0
+
+def enable(path, profile_stages=()):
+    """Turns on span recording (and optional profiling) for this process and the workers it starts."""
+    os.environ[METRICS_ENV] = os.path.abspath(path)
+    os.environ[RUN_ENV] = f"{int(time.time())}-{os.getpid()}"
+    if profile_stages:
+        os.environ[PROFILE_ENV] = ",".join(profile_stages)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    print(f"📈 Recording stage metrics to {path}")
+
+def process_peak_rss_mb():
+    """Returns this process's lifetime peak resident memory in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def emit(record):
+    """Appends one record to the metrics file as a JSON line."""
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+def _start_profiler(stage):
+    if stage not in os.environ.get(PROFILE_ENV, "").split(","):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Another profiler is already active in this thread (nested span)
+        return None
+    return profiler
+
+def _save_profile(profiler, stage):
+    global _profile_count
+    profiler.disable()
+    with _lock:
+        _profile_count += 1
+        count = _profile_count
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{stage}-{os.getpid()}-{count}.prof")
+    profiler.dump_stats(path)
+    return path
+
+@contextmanager
+def span(stage, **fields):
+    """Times a unit of work and records it as a JSON line when metrics are enabled.
+
+    Yields a dict to which the body can add fields, e.g. audio_seconds (which also yields the
+    real-time factor) or tokens. A body that waits on its input can set busy_s to its own working
+    time, and the real-time factor is then computed from that instead of the wall time. CPU time is that of the calling thread; child processes such as
+    ffmpeg and yt-dlp only show up in wall time. process_peak_rss_mb is the process's high-water mark
+    so far, not the memory used by this span.
+    """
+    if not os.environ.get(METRICS_ENV) and not os.environ.get(PROFILE_ENV):
+        yield fields
+        return
+    profiler = _start_profiler(stage)
+    started = time.time()
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["error"] = type(e).__name__
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        record = {
+            "run": os.environ.get(RUN_ENV),
+            "stage": stage,
+            "start": round(started, 3),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(time.thread_time() - cpu_start, 4),
+            "process_peak_rss_mb": process_peak_rss_mb(),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+        record.update(fields)
+        if fields.get("audio_seconds"):
+            record["rtf"] = round(fields.get("busy_s", wall) / fields["audio_seconds"], 4)
+        if profiler:
+            record["profile"] = _save_profile(profiler, stage)
+        emit(record)
+
+def load_spans(path, run=None):
+    """Reads the spans of a metrics file, optionally only those of one run."""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if run is None or record.get("run") == run:
+                spans.append(record)
+    return spans
+
+def summarize(spans):
+    """Aggregates spans per stage: count, errors, wall/CPU time, process peak RSS, audio seconds, RTF and tokens."""
+    stages = {}
+    for record in spans:
+        row = stages.setdefault(record["stage"], {
+            "count": 0, "errors": 0, "wall_s": 0.0, "busy_s": 0.0, "max_wall_s": 0.0, "cpu_s": 0.0,
+            "process_peak_rss_mb": 0.0, "audio_seconds": 0.0, "tokens": 0,
+        })
+        row["count"] += 1
+        row["errors"] += 1 if record.get("error") else 0
+        row["wall_s"] += record.get("wall_s", 0.0)
+        row["busy_s"] += record.get("busy_s", record.get("wall_s", 0.0))
+        row["max_wall_s"] = max(row["max_wall_s"], record.get("wall_s", 0.0))
+        row["cpu_s"] += record.get("cpu_s", 0.0)
+        row["process_peak_rss_mb"] = max(row["process_peak_rss_mb"], record.get("process_peak_rss_mb") or 0.0)
+        row["audio_seconds"] += record.get("audio_seconds") or 0.0
+        row["tokens"] += record.get("tokens") or 0
+    for row in stages.values():
+        row["mean_wall_s"] = row["wall_s"] / row["count"]
+        row["rtf"] = row["busy_s"] / row["audio_seconds"] if row["audio_seconds"] else None
+    return stages
+
+def print_summary(path=None, run=None):
+    """Prints a per-stage table for a metrics file (by default this run's spans in the enabled file)."""
+    path = path or os.environ.get(METRICS_ENV)
+    if not path or not os.path.exists(path):
+        return
+    stages = summarize(load_spans(path, run or os.environ.get(RUN_ENV)))
+    if not stages:
+        print("📈 No stage metrics recorded.")
+        return
+    header = f"{'stage':<14}{'count':>7}{'errors':>7}{'wall s':>10}{'mean s':>9}{'max s':>9}{'cpu s':>9}{'peak MB':>9}{'audio s':>10}{'RTF':>7}{'tokens':>9}"
+    print("\n📈 Stage summary")
+    print(header)
+    print("-" * len(header))
+    for stage, row in sorted(stages.items(), key=lambda item: -item[1]["wall_s"]):
+        rtf = f"{row['rtf']:.2f}" if row["rtf"] is not None else "-"
+        print(
+            f"{stage:<14}{row['count']:>7}{row['errors']:>7}{row['wall_s']:>10.1f}{row['mean_wall_s']:>9.2f}"
+            f"{row['max_wall_s']:>9.2f}{row['cpu_s']:>9.1f}{row['process_peak_rss_mb']:>9.0f}{row['audio_seconds']:>10.0f}"
+            f"{rtf:>7}{row['tokens']:>9}"
+        )
+
+def add_arguments(parser):
+    """Adds the --metrics and --profile options shared by every entry point."""
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Append per-stage timing and resource spans to this JSON-lines file and print a summary.")
+    parser.add_argument("--profile", metavar="STAGE", action="append", default=[],
+                        help=f"Run this stage under cProfile and save .prof files to {PROFILE_DIR}/ (repeatable), "
+                             "e.g. transcribe, language_id, translate, llm.")
+
+def setup(args):
+    """Enables instrumentation from parsed --metrics/--profile options."""
+    if args.metrics:
+        enable(args.metrics, args.profile)
+    elif args.profile:
+        os.environ[PROFILE_ENV] = ",".join(args.profile)
+
+def main(argv=None):
+    """Prints the per-stage summary of a metrics file."""
+    parser = argparse.ArgumentParser(description="Summarize per-stage metrics recorded with --metrics.")
+    parser.add_argument("path", help="JSON-lines metrics file.")
+    parser.add_argument("--run", help="Only include spans of this run id (default: all runs in the file).")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.path):
+        print(f"❌ Metrics file not found: {args.path}")
+        return
+    print_summary(args.path, args.run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+JOB_LEDGER_PATH = os.path.join("cache", "jobs.sqlite3")
+PATH_COLUMNS = ("transcription_path", "translated_path", "extracted_facts_path", "final_blog_path")
+
+def city_key(locality, days):
+    """Returns the ledger key of a CSV row; changing its `days` window starts the city over."""
+    return f"{locality}|{int(days)}"
+
+class JobLedger:
+    """SQLite record of pipeline work per (city, video, stage), written as soon as each unit finishes.
+
+    Video-level stages (download, transcribe, translate) use an empty city, and city-level stages
+    (search, blog) an empty video. A video's facts for a city are stored under "facts" or, with
+    --structured-facts, "structured_facts". Safe to share between threads.
+    """
+
+    def __init__(self, path=JOB_LEDGER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                city TEXT NOT NULL,
+                video TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                output TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (city, video, stage)
+            )"""
+        )
+        self.conn.commit()
+
+    def reset(self):
+        """Forgets all recorded work, for a run that starts over."""
+        with self.lock:
+            self.conn.execute("DELETE FROM jobs")
+            self.conn.commit()
+
+    def get(self, city, video, stage):
+        """Returns {'status', 'output'} for a unit of work, or None if it never ran."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, output FROM jobs WHERE city = ? AND video = ? AND stage = ?", (city, video, stage)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "output": json.loads(row[1]) if row[1] is not None else None}
+
+    def done(self, city, video, stage):
+        """Returns the output of a unit of work that completed, or None if it must (re)run."""
+        entry = self.get(city, video, stage)
+        return entry["output"] if entry and entry["status"] == "done" else None
+
+    def record(self, city, video, stage, status, output=None):
+        """Checkpoints one unit of work ('done', 'skipped' or 'failed') with its JSON-serializable output."""
+        payload = json.dumps(output, ensure_ascii=False) if output is not None else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs (city, video, stage, status, output, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (city, video, stage, status, payload, time.time()),
+            )
+            self.conn.commit()
+
+    def city_paths(self, city):
+        """Returns the output paths recorded for a city by its blog stage."""
+        entry = self.get(city, "", "blog")
+        paths = dict.fromkeys(PATH_COLUMNS, "")
+        if entry and entry["output"]:
+            paths.update(entry["output"])
+        return paths
+
+    def summary(self):
+        """Returns {stage: {status: count}}."""
+        with self.lock:
+            rows = self.conn.execute("SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status").fetchall()
+        counts = {}
+        for stage, status, count in rows:
+            counts.setdefault(stage, {})[status] = count
+        return counts
+
+    def report(self):
+        """Prints how many units of work each stage has done, skipped or failed."""
+        for stage, counts in sorted(self.summary().items()):
+            print(f"📊 {stage}: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+    def close(self):
+        self.conn.close()
+
+def write_csv_view(ledger, df, csv_path):
+    """Fills the CSV's output path columns from the ledger and saves it."""
+    paths = [ledger.city_paths(city_key(row["city"], row["days"])) for _, row in df.iterrows()]
+    for column in PATH_COLUMNS:
+        df[column] = [city_paths[column] for city_paths in paths]
+    df.to_csv(csv_path, index=False)
+    print(f"✅ Updated CSV with output paths: {csv_path}")
+
+def main(argv=None):
+    """Prints the job ledger's progress and rebuilds the CSV path columns from it."""
+    parser = argparse.ArgumentParser(description="Show pipeline progress and rebuild the CSV from the job ledger.")
+    parser.add_argument("--ledger", default=JOB_LEDGER_PATH, help=f"Job ledger path (default: {JOB_LEDGER_PATH}).")
+    parser.add_argument("--csv", default="city_locality_list.csv", help="CSV whose path columns are rebuilt.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.ledger):
+        print(f"❌ Job ledger not found: {args.ledger}")
+        return
+    if not os.path.exists(args.csv):
+        print(f"❌ CSV file not found: {args.csv}")
+        return
+    import pandas as pd
+    ledger = JobLedger(args.ledger)
+    try:
+        ledger.report()
+        write_csv_view(ledger, pd.read_csv(args.csv), args.csv)
+    finally:
+        ledger.close()
+
+if __name__ == "__main__":
+    main()
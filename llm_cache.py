@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+LLM_CACHE_DIR = "cache"
+LLM_CACHE_TTL_DAYS = 30    # Responses older than this are treated as misses and evicted
+LLM_CACHE_MAX_MB = 200     # Least recently used responses beyond this size are evicted
+
+def cache_key(model, messages, max_tokens, response_format=None):
+    """Returns a stable hash of everything that determines a chat completion."""
+    request = {"model": model, "messages": messages, "max_tokens": max_tokens}
+    if response_format is not None:
+        request["response_format"] = response_format
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """SQLite cache of chat completion responses keyed by cache_key, with TTL and size-based eviction.
+
+    Safe to share between threads, e.g. the stages of pipeline.py.
+    """
+
+    FILENAME = "llm_responses.sqlite3"
+    NAME = "LLM cache"
+
+    def __init__(self, cache_dir=LLM_CACHE_DIR, ttl_days=LLM_CACHE_TTL_DAYS, max_mb=LLM_CACHE_MAX_MB):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.ttl_seconds = ttl_days * 86400
+        self.max_bytes = max_mb * 1024 * 1024
+        self.conn = sqlite3.connect(os.path.join(cache_dir, self.FILENAME), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    def get(self, key):
+        """Returns the cached response for key, or None if missing or expired."""
+        with self.lock:
+            row = self.conn.execute("SELECT response, tokens, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[2] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+            self.tokens_saved += row[1]
+            return row[0]
+
+    def put(self, key, response, tokens=0):
+        """Stores a response; empty responses (API errors) are never cached."""
+        if not response:
+            return
+        with self.lock:
+            now = time.time()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, tokens, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, tokens, len(response.encode("utf-8")), now, now),
+            )
+            self.conn.commit()
+
+    def evict(self):
+        """Drops expired responses, then least recently used ones until the cache fits max_mb."""
+        cur = self.conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        evicted = cur.rowcount
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        self.conn.commit()
+        if evicted:
+            print(f"♻️ Evicted {evicted} entries from the {self.NAME}.")
+        return evicted
+
+    def report(self):
+        """Prints this run's hit rate and the tokens saved by cache hits."""
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        print(f"📊 LLM cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), ~{self.tokens_saved} tokens saved")
+
+    def close(self):
+        self.conn.close()
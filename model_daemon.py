@@ -0,0 +1,155 @@
+import os
+import json
+import socket
+import argparse
+import threading
+import socketserver
+
+DAEMON_SOCKET = os.path.join("cache", "models.sock")
+
+class SerializedModel:
+    """Wraps the language-ID model so concurrent requests classify one batch at a time."""
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+
+    def classify_batch(self, *args, **kwargs):
+        with self.lock:
+            return self.model.classify_batch(*args, **kwargs)
+
+class ModelDaemonHandler(socketserver.StreamRequestHandler):
+    """Answers one JSON request per line: {"op": "ping"} or {"op": "process_video", ...}."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                print(f"❌ Model daemon request failed: {e}")
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+def make_server(socket_path, language_id):
+    """Creates the threaded Unix-socket server that runs videos on the already loaded models."""
+    import transcription
+
+    class ModelDaemon(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def dispatch(self, request):
+            if request.get("op") == "ping":
+                return {"pid": os.getpid(), "vosk_models": list(transcription._vosk_models)}
+            if request.get("op") == "process_video":
+                outcome = transcription.process_video(
+                    request["video"], request["idx"], language_id, request.get("language"),
+                    audio_path=request.get("audio_path")
+                )
+                return {"outcome": list(outcome) if outcome else None}
+            raise ValueError(f"Unknown op: {request.get('op')}")
+
+    return ModelDaemon(socket_path, ModelDaemonHandler)
+
+def serve(socket_path=DAEMON_SOCKET, speechbrain_model_dir=None, languages=()):
+    """Loads the language-ID model and the given languages' Vosk models once, then serves requests until interrupted."""
+    import transcription
+    if not hasattr(socket, "AF_UNIX"):
+        print("❌ The model daemon needs Unix domain sockets, which this platform does not support.")
+        return
+    if ModelDaemonClient(socket_path).ping():
+        print(f"❌ A model daemon is already listening on {socket_path}.")
+        return
+    speechbrain_model_dir = speechbrain_model_dir or transcription.SPEECHBRAIN_MODEL_DIR
+    transcription.download_model_files(transcription.SPEECHBRAIN_REPO_ID, speechbrain_model_dir)
+    language_id = SerializedModel(transcription.load_language_id(speechbrain_model_dir))
+    print("✅ Language identification model loaded.")
+    for language in languages:
+        model_dir = transcription.LANGUAGE_TO_MODEL.get(language)
+        if model_dir and os.path.exists(model_dir):
+            transcription.load_vosk_model(model_dir)
+        else:
+            print(f"⚠️ Vosk model for '{language}' not found; it will not be preloaded.")
+
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # Left behind by a daemon that did not shut down cleanly
+    server = make_server(socket_path, language_id)
+    print(f"🚀 Model daemon listening on {socket_path} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping model daemon.")
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        transcription.report_vosk_models()
+
+class ModelDaemonClient:
+    """Sends videos to a running model daemon instead of loading the models in this process."""
+
+    def __init__(self, socket_path=DAEMON_SOCKET):
+        self.socket_path = socket_path
+
+    def request(self, payload):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(self.socket_path)
+            with conn.makefile("rwb") as stream:
+                stream.write((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+                stream.flush()
+                line = stream.readline()
+        if not line:
+            raise ConnectionError("Model daemon closed the connection.")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    def ping(self):
+        """Returns the daemon's status, or None if no daemon is listening."""
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(self.socket_path):
+            return None
+        try:
+            return self.request({"op": "ping"})
+        except (OSError, ValueError, RuntimeError):
+            return None
+
+    def process_video(self, vid, idx, language=None, audio_path=None):
+        """Runs process_video on the daemon; returns (language, transcript) or None."""
+        print(f"\n▶ Processing Video #{idx} on the model daemon: {vid.get('title')}")
+        try:
+            outcome = self.request({
+                "op": "process_video", "video": vid, "idx": idx, "language": language,
+                "audio_path": os.path.abspath(audio_path) if audio_path else None,
+            })["outcome"]
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ Model daemon failed on video #{idx}: {e}")
+            return None
+        return tuple(outcome) if outcome else None
+
+def parse_args(argv=None):
+    """Parses command-line options for the model daemon."""
+    parser = argparse.ArgumentParser(description="Keep the language-ID and Vosk models loaded for fast repeated runs.")
+    parser.add_argument("--socket", default=DAEMON_SOCKET, help=f"Unix socket path (default: {DAEMON_SOCKET}).")
+    parser.add_argument("--speechbrain-model", help="Local SpeechBrain language-ID model directory.")
+    parser.add_argument("--preload", default="en,hi,te,gu",
+                        help="Comma-separated languages whose Vosk models are loaded at startup (default: en,hi,te,gu).")
+    parser.add_argument("--status", action="store_true", help="Report whether a daemon is running and exit.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Runs the model daemon, or reports its status."""
+    args = parse_args(argv)
+    if args.status:
+        status = ModelDaemonClient(args.socket).ping()
+        if status:
+            print(f"✅ Model daemon running (pid {status['pid']}) with Vosk models: {', '.join(status['vosk_models']) or 'none'}")
+        else:
+            print(f"❌ No model daemon listening on {args.socket}.")
+        return
+    languages = [language.strip() for language in args.preload.split(",") if language.strip()]
+    serve(args.socket, args.speechbrain_model, languages)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,505 @@
+import os
+import queue
+import multiprocessing
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import blog_generation
+import transcription
+from transcription import (
+    ACCEPTED_LANGUAGES, LANGUAGE_TO_MODEL, SPEECHBRAIN_REPO_ID, SPEECHBRAIN_MODEL_DIR,
+    update_yt_dlp, search_youtube, filter_videos, sanitize_filename, download_model_files,
+    init_worker, process_video_in_worker, video_key
+)
+from fetch import SEARCH_CONCURRENCY, DOWNLOAD_CONCURRENCY, download_async
+from video_cache import VideoCache, CACHE_DIR, CACHE_MAX_MB, CACHE_MAX_AGE_DAYS
+from translation import TRANSLATORS, TRANSLATION_WORKERS, make_translator, translate_video
+from translation_cache import TranslationCache
+from model_daemon import ModelDaemonClient, DAEMON_SOCKET
+from blog_generation import (
+    FACT_CONCURRENCY, TOKENS_PER_MINUTE, TokenBudget,
+    extract_chunked_facts_async, extract_structured_facts_async, prepare_city_facts_async, write_city_blog
+)
+from llm_cache import LLMCache, LLM_CACHE_TTL_DAYS, LLM_CACHE_MAX_MB
+from fact_store import FactStore, FACT_STORE_PATH
+import instrumentation
+from job_ledger import JobLedger, JOB_LEDGER_PATH, PATH_COLUMNS, city_key, write_csv_view
+
+TRANSCRIBE_WORKERS = 2     # Transcription worker processes (each keeps its own language-ID and Vosk models)
+BLOG_WORKERS = 1           # Cities whose blog is generated at once
+QUEUE_SIZE = 8             # Max items waiting between two stages; a stage blocks when the next one's queue is full
+SEARCH_MAX_RESULTS = 200   # Search results requested per city, as in transcription.py
+MIN_DURATION = 50          # Shorter videos are skipped, as in transcription.py
+
+_DONE = object()
+
+class CityJob:
+    """One CSV row moving through the pipeline: its videos, their results and the files written for it."""
+
+    def __init__(self, index, locality, days):
+        self.index = index
+        self.locality = locality
+        self.days = int(days)
+        self.query = f"{locality} real estate market"
+        self.key = city_key(locality, days)
+        self.videos = []      # [(idx, video)] in search order
+        self.video_keys = {}  # idx -> video key
+        self.results = {}     # idx -> (language, transcript, translated)
+        self.facts = {}       # idx -> facts text, or fact records with --structured-facts
+        self.pending = set()  # idx of videos whose facts have not arrived yet
+        self.paths = dict.fromkeys(PATH_COLUMNS, "")
+
+def start_stage(name, inbox, handler, workers, on_error=None, downstream=None, downstream_workers=0):
+    """Starts `workers` threads applying handler to each item of inbox until they receive _DONE.
+
+    The last thread to finish sends one _DONE per downstream worker, so stages shut down in order.
+    """
+    finished = []
+    lock = threading.Lock()
+
+    def run():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            try:
+                handler(item)
+            except Exception as e:
+                print(f"❌ {name} stage failed: {e}")
+                if on_error:
+                    on_error(item)
+        with lock:
+            finished.append(True)
+            last = len(finished) == workers
+        if last and downstream is not None:
+            for _ in range(downstream_workers):
+                downstream.put(_DONE)
+
+    threads = [threading.Thread(target=run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+class Pipeline:
+    """Streams videos through search → download → transcribe → translate → extract facts → blog.
+
+    Every stage runs on its own workers and hands items to the next through a bounded queue, so a video
+    moves on as soon as it is ready and a slow stage holds back the ones before it instead of piling up
+    work. Videos found for several cities are processed once; each city's blog starts as soon as the
+    facts of its last video arrive.
+    """
+
+    def __init__(self, args, video_cache, translator, ledger, translation_cache=None, fact_store=None):
+        self.args = args
+        self.ledger = ledger
+        self.video_cache = video_cache
+        self.translator = translator
+        self.translation_cache = translation_cache
+        self.fact_store = fact_store
+        self.download_dir = os.path.join("test", "downloads")
+        self.city_queue = queue.Queue()
+        self.download_queue = queue.Queue(max(args.queue_size, 1))
+        self.transcribe_queue = queue.Queue(max(args.queue_size, 1))
+        self.translate_queue = queue.Queue(max(args.queue_size, 1))
+        self.facts_queue = queue.Queue(max(args.queue_size, 1))
+        self.blog_queue = queue.Queue(max(args.queue_size, 1))
+        self.lock = threading.Lock()
+        self.subscribers = {}   # video key -> [(city, idx)] waiting for the video
+        self.finished = {}      # video key -> whether it succeeded; its result stays in the job ledger
+        self.executor = None
+
+    def search_city(self, city):
+        """Searches one city and routes each of its videos, subscribing to videos another city already started."""
+        print(f"\n▶ City: {city.query} with days: {city.days}")
+        videos = self.ledger.done(city.key, "", "search")
+        if videos is not None:
+            print(f"♻️ Resuming with {len(videos)} videos found by the previous run.")
+        else:
+            results = search_youtube(city.query, self.args.max_results, city.days, MIN_DURATION)
+            videos = filter_videos(results, city.days, min_duration=MIN_DURATION)
+            self.ledger.record(city.key, "", "search", "done", videos)
+        if not videos:
+            print(f"❌ No suitable videos found for {city.query}.")
+        new_videos, reused = [], []
+        with self.lock:
+            for idx, vid in enumerate(videos, start=1):
+                key = video_key(vid)
+                if not key:
+                    continue
+                city.videos.append((idx, vid))
+                city.video_keys[idx] = key
+                if key in self.finished:
+                    if self.finished[key]:
+                        city.pending.add(idx)
+                        reused.append((idx, key))
+                    continue
+                city.pending.add(idx)
+                if key not in self.subscribers:
+                    self.subscribers[key] = []
+                    new_videos.append((len(self.finished) + len(self.subscribers), vid))
+                self.subscribers[key].append((city, idx))
+            done = not city.pending
+        for number, vid in new_videos:
+            self.start_video(number, vid)
+        for idx, key in reused:
+            # Finished videos are not kept in memory; reload the one another city already translated
+            city.results[idx] = tuple(self.ledger.done("", key, "translate"))
+            self.facts_queue.put((city, idx, city.results[idx][2]))
+        if done:
+            self.facts_queue.put((city, None, None))
+
+    def start_video(self, number, vid):
+        """Sends a newly seen video to the first stage it still needs, skipping work the video cache already holds."""
+        key = video_key(vid)
+        translated = self.ledger.done("", key, "translate")
+        if translated is not None:
+            print(f"♻️ Resuming Video #{number} from the job ledger: {vid.get('title')}")
+            self.video_finished(key, tuple(translated))
+            return
+        entry = self.video_cache.get(vid["id"]) if vid.get("id") else None
+        language = entry["language"] if entry else None
+        if entry and entry["transcript"]:
+            print(f"♻️ Reusing cached transcript for Video #{number}: {vid.get('title')}")
+            self.video_cache.record(hit=True)
+            self.translate_queue.put((number, key, vid, language, entry["transcript"]))
+        elif language and language not in ACCEPTED_LANGUAGES:
+            print(f"♻️ Skipping Video #{number}: cached language '{language}' is not accepted.")
+            self.video_cache.record(hit=True)
+            self.video_finished(key, None)
+        else:
+            self.video_cache.record(hit=False)
+            next_queue = self.download_queue if self.args.download_workers > 0 else self.transcribe_queue
+            next_queue.put((number, key, vid, language, None))
+
+    def download(self, item):
+        """Downloads a video's audio so transcription workers never wait on the network."""
+        number, key, vid, language, _ = item
+        audio_path = asyncio.run(download_async(vid, self.download_dir))
+        if not audio_path:
+            self.ledger.record("", key, "download", "failed")
+            self.video_finished(key, None)
+            return
+        self.transcribe_queue.put((number, key, vid, language, audio_path))
+
+    def transcribe(self, item):
+        """Identifies and transcribes a video on a worker process (streaming it if it was not downloaded)."""
+        number, key, vid, language, audio_path = item
+        outcome = self.executor.submit(process_video_in_worker, vid, number, language, audio_path).result()
+        if outcome:
+            self.video_cache.put(vid, *outcome)
+        status = "failed" if not outcome else "done" if outcome[1] else "skipped"
+        self.ledger.record("", key, "transcribe", status, outcome[0] if outcome else None)
+        if outcome and outcome[1]:
+            self.translate_queue.put((number, key, vid) + tuple(outcome))
+        else:
+            self.video_finished(key, None)
+
+    def translate(self, item):
+        """Translates a non-English transcript (English passes through) and releases the video to its cities."""
+        number, key, vid, language, transcript = item
+        if language == "en":
+            translated = transcript
+        else:
+            print(f"🔄 Translating Video #{number} ({language})...")
+            translated = translate_video(transcript, language, self.translator, self.translation_cache, self.args.backend)
+        self.ledger.record("", key, "translate", "done", [language, transcript, translated])
+        self.video_finished(key, (language, transcript, translated))
+
+    def video_failed(self, item):
+        self.video_finished(item[1], None)
+
+    def video_finished(self, key, result):
+        """Hands a finished video to every city waiting for it; cities it leaves complete are sent on without facts."""
+        jobs, done = [], []
+        with self.lock:
+            self.finished[key] = bool(result)
+            for city, idx in self.subscribers.pop(key, []):
+                if result:
+                    city.results[idx] = result
+                    jobs.append((city, idx, result[2]))
+                else:
+                    city.pending.discard(idx)
+                    if not city.pending:
+                        done.append(city)
+        for job in jobs:
+            self.facts_queue.put(job)
+        for city in done:
+            self.facts_queue.put((city, None, None))
+
+    def facts_finished(self, city, idx, facts):
+        """Records one video's facts for a city; returns True once the city has all of them."""
+        with self.lock:
+            city.facts[idx] = facts
+            city.pending.discard(idx)
+            return not city.pending
+
+    def city_paths(self, city):
+        filename = f"{sanitize_filename(city.query)}_transcript.txt"
+        return os.path.join("transcripts", filename), os.path.join("translated", filename)
+
+    def write_transcripts(self, city):
+        """Writes a city's transcript and translation files in the same format as the stand-alone scripts."""
+        transcript_path, translated_path = self.city_paths(city)
+        blocks = [(idx, city.results[idx]) for idx, _ in city.videos if idx in city.results]
+        with open(transcript_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(f"==== Video {idx} ({language}) ====\n{transcript}\n"
+                              for idx, (language, transcript, _) in blocks))
+        with open(translated_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(f"==== Video {idx} ({language}) ====\n{translated}\n"
+                              for idx, (language, _, translated) in blocks))
+        print(f"✅ Transcript saved to: {transcript_path}")
+        city.paths["transcription_path"] = transcript_path
+        city.paths["translated_path"] = translated_path
+        return translated_path
+
+    async def prepare_blog(self, city, semaphore, budget):
+        """Writes a finished city's transcripts and condenses its facts, then queues its blog."""
+        if not city.results:
+            print(f"❌ No transcripts generated for {city.query}.")
+            await asyncio.to_thread(self.blog_queue.put, (city, "", ""))
+            return
+        translated_path = self.write_transcripts(city)
+        video_facts = [city.facts[idx] for idx, _ in city.videos if idx in city.results]
+        facts_text, blog_facts_text = await prepare_city_facts_async(
+            city.locality, translated_path, video_facts, self.fact_store, semaphore, budget
+        )
+        await asyncio.to_thread(self.blog_queue.put, (city, facts_text, blog_facts_text))
+
+    async def extract_facts(self):
+        """Extracts facts for (city, video) jobs as they arrive, fact_workers at a time within the token budget.
+
+        A job without a video, (city, None, None), marks a city whose remaining videos all failed.
+        """
+        slots = asyncio.Semaphore(max(self.args.fact_workers, 1))
+        semaphore = asyncio.Semaphore(max(self.args.fact_workers, 1))
+        budget = TokenBudget(self.args.tokens_per_minute) if self.args.tokens_per_minute else None
+        extract = extract_structured_facts_async if self.fact_store else extract_chunked_facts_async
+        # Text and structured facts are checkpointed apart, so --resume never mixes the two formats
+        stage = "structured_facts" if self.fact_store else "facts"
+        tasks = set()
+
+        async def run(city, idx, text):
+            try:
+                if idx is None:
+                    complete = True
+                else:
+                    facts = self.ledger.done(city.key, city.video_keys[idx], stage)
+                    if facts is None:
+                        facts = await extract(text, city.locality, semaphore, budget)
+                        # Structured extraction returns None on API failure; [] is a valid result without facts
+                        failed = facts is None if self.fact_store else not facts
+                        self.ledger.record(city.key, city.video_keys[idx], stage, "failed" if failed else "done", facts)
+            except Exception as e:
+                print(f"❌ Fact extraction failed for {city.locality}: {e}")
+                facts = [] if self.fact_store else ""
+            finally:
+                slots.release()
+            if idx is not None:
+                complete = self.facts_finished(city, idx, facts)
+            if complete:
+                try:
+                    await self.prepare_blog(city, semaphore, budget)
+                except Exception as e:
+                    print(f"❌ Could not prepare the blog for {city.locality}: {e}")
+                    await asyncio.to_thread(self.blog_queue.put, (city, "", ""))
+
+        while True:
+            await slots.acquire()
+            job = await asyncio.to_thread(self.facts_queue.get)
+            if job is _DONE:
+                break
+            task = asyncio.create_task(run(*job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    def run_facts_stage(self):
+        try:
+            asyncio.run(self.extract_facts())
+        finally:
+            for _ in range(max(self.args.blog_workers, 1)):
+                self.blog_queue.put(_DONE)
+
+    def write_blog(self, item):
+        """Generates and saves a finished city's blog, then checkpoints the city with its output paths."""
+        city, facts_text, blog_facts_text = item
+        if not facts_text:
+            self.ledger.record(city.key, "", "blog", "failed", city.paths)
+            return
+        facts_path, blog_path = write_city_blog(
+            city.locality, city.days, city.paths["translated_path"], facts_text, blog_facts_text,
+            "extracted_facts", "final_blog"
+        )
+        city.paths["extracted_facts_path"] = facts_path
+        city.paths["final_blog_path"] = blog_path
+        self.ledger.record(city.key, "", "blog", "done" if blog_path else "failed", city.paths)
+
+    def blog_failed(self, item):
+        self.ledger.record(item[0].key, "", "blog", "failed", item[0].paths)
+
+    def run(self, cities):
+        """Runs every city through the pipeline and returns once all blogs are written."""
+        for directory in ("transcripts", "translated", "extracted_facts", "final_blog"):
+            os.makedirs(directory, exist_ok=True)
+        args = self.args
+        search_workers = max(args.search_workers, 1)
+        download_workers = max(args.download_workers, 0)
+        transcribe_workers = max(args.transcribe_workers, 1)
+        translate_workers = max(args.translate_workers, 1)
+        blog_workers = max(args.blog_workers, 1)
+        first_video_queue = self.download_queue if download_workers else self.transcribe_queue
+        first_video_workers = download_workers or transcribe_workers
+
+        if transcription.model_daemon_client:
+            self.executor = ThreadPoolExecutor(max_workers=transcribe_workers)
+        else:
+            # Workers are started lazily from stage threads, so they must not be forked mid-run
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self.executor = ProcessPoolExecutor(
+                max_workers=transcribe_workers, mp_context=multiprocessing.get_context(start_method),
+                initializer=init_worker, initargs=(SPEECHBRAIN_MODEL_DIR,)
+            )
+        print(
+            f"🚀 Pipeline: {search_workers} search, {download_workers} download, {transcribe_workers} transcribe, "
+            f"{translate_workers} translate, {args.fact_workers} fact and {blog_workers} blog workers."
+        )
+        try:
+            threads = start_stage("search", self.city_queue, self.search_city, search_workers,
+                                  downstream=first_video_queue, downstream_workers=first_video_workers)
+            if download_workers:
+                threads += start_stage("download", self.download_queue, self.download, download_workers,
+                                       self.video_failed, self.transcribe_queue, transcribe_workers)
+            threads += start_stage("transcribe", self.transcribe_queue, self.transcribe, transcribe_workers,
+                                   self.video_failed, self.translate_queue, translate_workers)
+            threads += start_stage("translate", self.translate_queue, self.translate, translate_workers,
+                                   self.video_failed, self.facts_queue, 1)
+            facts_thread = threading.Thread(target=self.run_facts_stage, name="facts", daemon=True)
+            facts_thread.start()
+            threads += start_stage("blog", self.blog_queue, self.write_blog, blog_workers, self.blog_failed)
+
+            for city in cities:
+                if self.ledger.done(city.key, "", "blog") is not None:
+                    print(f"♻️ {city.query} was finished by a previous run; skipping.")
+                    continue
+                self.city_queue.put(city)
+            for _ in range(search_workers):
+                self.city_queue.put(_DONE)
+            for thread in threads + [facts_thread]:
+                thread.join()
+        finally:
+            self.executor.shutdown()
+
+def parse_args(argv=None):
+    """Parses command-line options for the streaming pipeline."""
+    parser = argparse.ArgumentParser(
+        description="Search, transcribe, translate and blog every city in one streaming run."
+    )
+    parser.add_argument("--search-workers", type=int, default=SEARCH_CONCURRENCY,
+                        help=f"Cities searched at once (default: {SEARCH_CONCURRENCY}).")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_CONCURRENCY,
+                        help="Audio downloads running at once; 0 streams each video while it is transcribed "
+                             f"(default: {DOWNLOAD_CONCURRENCY}).")
+    parser.add_argument("--transcribe-workers", type=int, default=TRANSCRIBE_WORKERS,
+                        help=f"Transcription worker processes (default: {TRANSCRIBE_WORKERS}).")
+    parser.add_argument("--translate-workers", type=int, default=TRANSLATION_WORKERS,
+                        help=f"Videos translated at once (default: {TRANSLATION_WORKERS}).")
+    parser.add_argument("--fact-workers", type=int, default=FACT_CONCURRENCY,
+                        help=f"Fact-extraction requests in flight at once (default: {FACT_CONCURRENCY}).")
+    parser.add_argument("--blog-workers", type=int, default=BLOG_WORKERS,
+                        help=f"City blogs generated at once (default: {BLOG_WORKERS}).")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help=f"Max items waiting between two stages (default: {QUEUE_SIZE}).")
+    parser.add_argument("--max-results", type=int, default=SEARCH_MAX_RESULTS,
+                        help=f"Search results requested per city (default: {SEARCH_MAX_RESULTS}).")
+    parser.add_argument("--tokens-per-minute", type=int, default=TOKENS_PER_MINUTE,
+                        help=f"Estimated token budget per minute for fact extraction, 0 to disable (default: {TOKENS_PER_MINUTE}).")
+    parser.add_argument("--backend", choices=sorted(TRANSLATORS), default="marian",
+                        help="Translation backend (default: marian).")
+    parser.add_argument("--structured-facts", action="store_true",
+                        help="Extract facts as JSON records, index them in the fact store and deduplicate them across videos.")
+    parser.add_argument("--fact-store", default=FACT_STORE_PATH,
+                        help=f"SQLite fact store used with --structured-facts (default: {FACT_STORE_PATH}).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"Directory of the video, translation and LLM caches (default: {CACHE_DIR}).")
+    parser.add_argument("--no-translation-cache", action="store_true",
+                        help="Translate every non-English video again instead of reusing cached translations.")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Always call the API, without reading or writing the response cache.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the previous run from the job ledger, redoing only new or failed work.")
+    parser.add_argument("--ledger", default=JOB_LEDGER_PATH,
+                        help=f"SQLite job ledger checkpointing every finished unit of work (default: {JOB_LEDGER_PATH}).")
+    parser.add_argument("--skip-update", action="store_true",
+                        help="Do not run 'yt-dlp -U' at startup.")
+    parser.add_argument("--daemon", nargs="?", const=DAEMON_SOCKET, metavar="SOCKET",
+                        help="Transcribe on a running model_daemon.py instead of loading the models in worker "
+                             f"processes (default socket: {DAEMON_SOCKET}).")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Runs the whole pipeline for every city in the CSV and records the output paths."""
+    args = parse_args(argv)
+    instrumentation.setup(args)
+    csv_path = "city_locality_list.csv"
+    if not os.path.exists(csv_path):
+        print(f"❌ CSV file not found: {csv_path}")
+        return
+    import pandas as pd
+    df = pd.read_csv(csv_path)
+    if "city" not in df.columns or "days" not in df.columns:
+        print("❌ CSV must contain 'city' and 'days' columns.")
+        return
+    if not args.skip_update:
+        update_yt_dlp()
+
+    if args.daemon:
+        transcription.model_daemon_client = ModelDaemonClient(args.daemon)
+        if transcription.model_daemon_client.ping():
+            print(f"✅ Using the model daemon on {args.daemon}.")
+        else:
+            print(f"⚠️ No model daemon listening on {args.daemon}; loading models in worker processes.")
+            transcription.model_daemon_client = None
+    if not transcription.model_daemon_client:
+        download_model_files(SPEECHBRAIN_REPO_ID, SPEECHBRAIN_MODEL_DIR)
+        for lang, path in LANGUAGE_TO_MODEL.items():
+            if not os.path.exists(path):
+                print(f"⚠️ Warning: Vosk model path for '{lang}' not set or does not exist: {path}. Update in transcription.py.")
+
+    ledger = JobLedger(args.ledger)
+    if not args.resume:
+        ledger.reset()
+    video_cache = VideoCache(args.cache_dir)
+    translation_cache = None if args.no_translation_cache else TranslationCache(args.cache_dir)
+    fact_store = FactStore(args.fact_store) if args.structured_facts else None
+    if not args.no_llm_cache:
+        blog_generation.response_cache = LLMCache(args.cache_dir, LLM_CACHE_TTL_DAYS, LLM_CACHE_MAX_MB)
+    translator = make_translator(args.backend)
+
+    cities = [CityJob(index, row["city"], row["days"]) for index, row in df.iterrows()]
+    try:
+        Pipeline(args, video_cache, translator, ledger, translation_cache, fact_store).run(cities)
+    finally:
+        translator.close()
+        video_cache.evict(CACHE_MAX_MB, CACHE_MAX_AGE_DAYS)
+        video_cache.report()
+        video_cache.close()
+        if translation_cache:
+            translation_cache.evict()
+            translation_cache.report()
+            translation_cache.close()
+        if fact_store:
+            fact_store.close()
+        if blog_generation.response_cache:
+            blog_generation.response_cache.evict()
+            blog_generation.response_cache.report()
+            blog_generation.response_cache.close()
+            blog_generation.response_cache = None
+        write_csv_view(ledger, df, csv_path)
+        ledger.report()
+        ledger.close()
+    instrumentation.print_summary()
+
+if __name__ == "__main__":
+    main()
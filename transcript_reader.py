@@ -0,0 +1,29 @@
+import re
+
+VIDEO_HEADER_PATTERN = re.compile(r'^====\s*Video\s*(\d+)\s*(?:\(([^)]*)\))?\s*====\s*$')
+
+def video_header(video_index, language=None):
+    """Returns the '==== Video N (lang) ====' line that starts a video's block."""
+    return f"==== Video {video_index} ({language}) ====" if language else f"==== Video {video_index} ===="
+
+def iter_video_transcripts(file_path):
+    """Yields (video_index, language or None, text) for each '==== Video N (lang) ====' block of a transcript file.
+
+    The file is read line by line, so only the current video is held in memory and each record is
+    available as soon as the next header is reached. Text before the first header is ignored.
+    """
+    video_index = language = None
+    lines = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = VIDEO_HEADER_PATTERN.match(line) if line.startswith("====") else None
+            if match:
+                if video_index is not None:
+                    yield video_index, language, "".join(lines).strip()
+                video_index = int(match.group(1))
+                language = match.group(2).strip() if match.group(2) else None
+                lines = []
+            elif video_index is not None:
+                lines.append(line)
+    if video_index is not None:
+        yield video_index, language, "".join(lines).strip()
@@ -1,46 +1,58 @@
 import os
 import json
+import argparse
+import time
 import subprocess
 import datetime
+import threading
+from collections import OrderedDict
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import timedelta
 import wave
-from vosk import Model, KaldiRecognizer
-from pydub import AudioSegment
-import torch
-import soundfile as sf
-from speechbrain.pretrained import EncoderClassifier
-from huggingface_hub import hf_hub_download
 import re
-import pandas as pd
+from fetch import YT_DLP, SEARCH_CONCURRENCY, DOWNLOAD_CONCURRENCY, search_many, prefetch_audio
+from video_cache import VideoCache, CACHE_DIR, CACHE_MAX_MB, CACHE_MAX_AGE_DAYS
+from model_daemon import ModelDaemonClient, DAEMON_SOCKET
+import instrumentation
+from instrumentation import span
 
 # Configurable Vosk model paths (users set these)
 VOSK_MODEL_EN = "path/to/vosk-model-small-en-in-0.4"  # English (small model)
 VOSK_MODEL_HI = "path/to/vosk-model-small-hi-0.22"    # Hindi (small model)
 VOSK_MODEL_TE = "path/to/vosk-model-small-te-0.42"    # Telugu (small model)
 VOSK_MODEL_GU = "path/to/vosk-model-small-gu-0.42"    # Gujarati (small model)
+SAMPLE_RATE = 16000          # Vosk and SpeechBrain both consume 16 kHz mono PCM s16le
+PCM_CHUNK_BYTES = 8000       # 4000 frames per AcceptWaveform call, as in transcribe_vosk
+LANGUAGE_ID_SECONDS = 50     # Audio prefix used for language identification
+VAD_FRAME_MS = 30            # Frame size for the energy-based voice activity detector
+VAD_MIN_SILENCE_RMS = 200    # Frames quieter than this (or half the median energy) count as silence
+CHUNK_TARGET_SECONDS = 30    # Chunked mode looks for a silence to cut at after this much audio...
+CHUNK_MAX_SECONDS = 60       # ...and cuts at the quietest frame if none is found before this
+VOSK_MODEL_CACHE_SIZE = 4    # Max number of Vosk models kept resident at once (least recently used is evicted)
+SPEECHBRAIN_REPO_ID = "speechbrain/lang-id-voxlingua107-ecapa"
+SPEECHBRAIN_MODEL_DIR = os.path.join("test", "speechbrain_model")
+SPEECHBRAIN_FILES = ("hyperparams.yaml", "embedding_model.ckpt", "label_encoder.txt")
+
+# torch, torchaudio, soundfile, speechbrain, vosk, pydub, huggingface_hub and pandas are imported
+# inside the functions that use them, so searches, cache hits and --daemon runs start without them.
+
+_vosk_models = OrderedDict()
+_vosk_model_stats = {}
+_vosk_models_lock = threading.Lock()  # The model daemon serves several videos at once
 
 def update_yt_dlp():
     """Updates yt-dlp to the latest version."""
     print("🔄 Updating yt-dlp...")
     try:
-        subprocess.run(["yt-dlp", "-U"], check=True)
+        subprocess.run([YT_DLP, "-U"], check=True)
         print("✅ yt-dlp updated successfully!")
     except subprocess.CalledProcessError:
         print("⚠️ Could not update yt-dlp. Continuing...")
 
-def search_youtube(keyword, max_results=10):
-    """Searches YouTube for videos based on a keyword."""
-    print(f"🔎 Searching YouTube for '{keyword}' (max {max_results} results)...")
-    cmd = ["yt-dlp", "--dump-json", f"ytsearch{max_results}:{keyword}"]
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split("\n")
-        videos = [json.loads(line) for line in lines]
-        print(f"✅ Found {len(videos)} results.")
-        return videos
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error running yt-dlp search: {e}")
-        return []
+def search_youtube(keyword, max_results=10, days=None, min_duration=0):
+    """Searches YouTube for videos based on a keyword, retrying a failed search like search_many does."""
+    return search_many([keyword], max_results, 1, days, min_duration)[0]
 
 def filter_videos(video_list, days, min_duration=120):
     """Filters videos by upload date and minimum duration."""
@@ -50,7 +62,7 @@ def filter_videos(video_list, days, min_duration=120):
     filtered = []
     for vid in video_list:
         upload_date_str = vid.get("upload_date")
-        duration = vid.get("duration", 0)
+        duration = vid.get("duration") or 0
         if not upload_date_str or duration < min_duration:
             continue
         try:
@@ -66,114 +78,620 @@ def sanitize_filename(title):
     """Sanitizes a title for use as a filename."""
     return re.sub(r'[<>:"/\\|?*’!]', '', title).replace(" ", "_")
 
-def download_audio(video_data, output_dir="downloads"):
-    """Downloads audio from a YouTube video."""
-    os.makedirs(output_dir, exist_ok=True)
-    video_title = sanitize_filename(video_data.get("title", "audio"))
-    output_template = os.path.join(output_dir, f"{video_title}.mp3")
-    webpage_url = video_data.get("webpage_url")
-    if not webpage_url:
-        print("❌ No webpage_url found; skipping.")
-        return None
+def decode_pcm(source, chunk_bytes=PCM_CHUNK_BYTES, stdin=None):
+    """Decodes any ffmpeg-readable source to 16kHz mono PCM s16le, yielding fixed-size chunks."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", source,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1"
+    ]
+    decoder = subprocess.Popen(cmd, stdin=stdin if stdin is not None else subprocess.DEVNULL, stdout=subprocess.PIPE)
+    completed = False
     try:
-        print(f"📥 Downloading audio for {video_data.get('title')}...")
-        cmd = [
-            "yt-dlp", "-f", "bestaudio",
-            "--extract-audio", "--audio-format", "mp3",
-            "-o", output_template,
-            webpage_url
-        ]
-        subprocess.run(cmd, check=True)
-        if os.path.exists(output_template):
-            print(f"✅ Audio downloaded: {output_template}")
-            return output_template
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Download failed: {e}")
-        return None
+        while True:
+            chunk = decoder.stdout.read(chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+        completed = True
+    finally:
+        decoder.stdout.close()
+        if decoder.poll() is None:
+            decoder.terminate()
+        returncode = decoder.wait()
+    if completed and returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {returncode} while decoding {source}")
+
+def stream_audio(webpage_url, chunk_bytes=PCM_CHUNK_BYTES):
+    """Streams a video's audio from yt-dlp through ffmpeg as 16kHz mono PCM chunks, without temp files."""
+    cmd = [YT_DLP, "-f", "bestaudio", "--quiet", "--no-warnings", "-o", "-", webpage_url]
+    downloader = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    completed = False
+    try:
+        yield from decode_pcm("pipe:0", chunk_bytes, stdin=downloader.stdout)
+        completed = True
+    finally:
+        downloader.stdout.close()
+        if downloader.poll() is None and not completed:
+            downloader.terminate()
+        returncode = downloader.wait()
+    # A download that fails partway leaves ffmpeg with a truncated but valid stream
+    if returncode != 0:
+        raise RuntimeError(f"yt-dlp exited with code {returncode} while streaming {webpage_url}")
+
+def read_pcm_prefix(chunks, seconds=LANGUAGE_ID_SECONDS):
+    """Pulls the first `seconds` of audio (or all of it, if shorter) from a PCM chunk iterator."""
+    limit = seconds * SAMPLE_RATE * 2
+    prefix = bytearray()
+    with span("stream", part="prefix") as metrics:
+        for chunk in chunks:
+            prefix.extend(chunk)
+            if len(prefix) >= limit:
+                break
+        metrics["audio_seconds"] = len(prefix) / (2 * SAMPLE_RATE)
+    return bytes(prefix)
+
+def split_pcm(pcm, chunk_bytes=PCM_CHUNK_BYTES):
+    """Splits a PCM buffer back into fixed-size chunks."""
+    return (pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes))
 
 def convert_to_wav(input_path, wav_path):
     """Converts MP3 to WAV format (16kHz, mono, PCM s16le)."""
     try:
+        from pydub import AudioSegment
         print(f"🔄 Converting {input_path} to WAV...")
-        audio = AudioSegment.from_file(input_path)
-        audio = audio.set_channels(1).set_frame_rate(16000)
-        audio.export(wav_path, format="wav", codec="pcm_s16le")
+        with span("convert", path=os.path.basename(input_path)) as metrics:
+            audio = AudioSegment.from_file(input_path)
+            metrics["audio_seconds"] = audio.duration_seconds
+            audio = audio.set_channels(1).set_frame_rate(16000)
+            audio.export(wav_path, format="wav", codec="pcm_s16le")
         print(f"✅ Conversion completed: {wav_path}")
         return wav_path
     except Exception as e:
         print(f"❌ Error converting to WAV: {e}")
         return None
 
-def identify_language(wav_path, language_id, temp_dir):
-    """Identifies the language of an audio file."""
+def pcm_to_waveform(pcm, seconds=LANGUAGE_ID_SECONDS):
+    """Converts the first `seconds` of 16kHz mono PCM s16le to a float waveform tensor."""
+    import torch
+    pcm = pcm[:seconds * SAMPLE_RATE * 2]
+    samples = torch.frombuffer(bytearray(pcm), dtype=torch.int16)
+    return samples.to(torch.float32) / 32768.0
+
+def identify_language(wav_path, language_id, *, seconds=LANGUAGE_ID_SECONDS):
+    """Identifies the language of an audio file from its in-memory prefix."""
     try:
-        audio = AudioSegment.from_wav(wav_path)
-        segment = audio[:50000] if len(audio) > 50000 else audio
-        temp_wav = os.path.join(temp_dir, f"temp_{os.path.basename(wav_path)}")
-        segment.export(temp_wav, format="wav", codec="pcm_s16le")
-
-        data, sample_rate = sf.read(temp_wav)
-        waveform = torch.tensor(data, dtype=torch.float32).unsqueeze(0)
-        if sample_rate != 16000:
-            print("⚠️ Resampling to 16000 Hz...")
-            waveform = torch.tensor(torchaudio.transforms.Resample(sample_rate, 16000)(waveform.numpy()))
+        import torch
+        import torchaudio
+        import soundfile as sf
+        info = sf.info(wav_path)
+        data, sample_rate = sf.read(wav_path, frames=int(seconds * info.samplerate), dtype="float32", always_2d=True)
+        waveform = torch.from_numpy(data.T)
         if waveform.shape[0] > 1:
             waveform = waveform.mean(dim=0, keepdim=True)
-        if waveform.shape[1] > 960000:
-            waveform = waveform[:, :960000]
+        if sample_rate != SAMPLE_RATE:
+            print(f"⚠️ Resampling to {SAMPLE_RATE} Hz...")
+            waveform = torchaudio.transforms.Resample(sample_rate, SAMPLE_RATE)(waveform)
 
-        prediction = language_id.classify_batch(wav_path)
+        with span("language_id", audio_seconds=waveform.shape[-1] / SAMPLE_RATE):
+            prediction = language_id.classify_batch(waveform)
         language = prediction[3][0].split(':')[0].strip()
-        os.remove(temp_wav)
         print(f"🌐 Identified language: {language}")
         return language
     except Exception as e:
         print(f"❌ Error identifying language: {e}")
         return "en"
 
-def transcribe_vosk(wav_path, model_dir):
-    """Transcribes WAV audio using Vosk."""
+def identify_language_pcm(pcm, language_id, seconds=LANGUAGE_ID_SECONDS):
+    """Identifies the language of an in-memory 16kHz mono PCM s16le buffer."""
+    try:
+        waveform = pcm_to_waveform(pcm, seconds).unsqueeze(0)
+        with span("language_id", audio_seconds=waveform.shape[-1] / SAMPLE_RATE):
+            prediction = language_id.classify_batch(waveform)
+        language = prediction[3][0].split(':')[0].strip()
+        print(f"🌐 Identified language: {language}")
+        return language
+    except Exception as e:
+        print(f"❌ Error identifying language: {e}")
+        return "en"
+
+def identify_languages_batch(prefixes, language_id, seconds=LANGUAGE_ID_SECONDS):
+    """Identifies the languages of several PCM prefixes with one padded classify_batch call."""
+    import torch
+    waveforms = [pcm_to_waveform(pcm, seconds) for pcm in prefixes]
+    if not waveforms:
+        return []
+    try:
+        longest = max(len(w) for w in waveforms)
+        if longest == 0:
+            raise ValueError("All audio prefixes are empty.")
+        batch = torch.zeros(len(waveforms), longest)
+        for i, waveform in enumerate(waveforms):
+            batch[i, :len(waveform)] = waveform
+        wav_lens = torch.tensor([len(w) / longest for w in waveforms])
+        with span("language_id", videos=len(waveforms), audio_seconds=sum(len(w) for w in waveforms) / SAMPLE_RATE):
+            prediction = language_id.classify_batch(batch, wav_lens)
+        languages = [label.split(':')[0].strip() for label in prediction[3]]
+        print(f"🌐 Identified languages for {len(languages)} videos in one batch.")
+        return languages
+    except Exception as e:
+        print(f"❌ Error identifying languages in batch: {e}")
+        return ["en"] * len(waveforms)
+
+def fetch_pcm_prefix(webpage_url, seconds=LANGUAGE_ID_SECONDS):
+    """Streams just the first `seconds` of a video's audio and stops the download."""
+    chunks = stream_audio(webpage_url)
     try:
+        return read_pcm_prefix(chunks, seconds)
+    except Exception as e:
+        print(f"❌ Could not fetch audio prefix for {webpage_url}: {e}")
+        return b""
+    finally:
+        chunks.close()
+
+def classify_videos(videos, language_id, language_cache, batch_size=8):
+    """Fills language_cache for videos not yet classified, batching their prefixes through the model."""
+    pending = [vid for vid in videos if vid.get("id") and vid["id"] not in language_cache and vid.get("webpage_url")]
+    if not pending:
+        return
+    print(f"🌐 Classifying language for {len(pending)} uncached videos (batch size {batch_size})...")
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+            prefixes = list(pool.map(fetch_pcm_prefix, [vid["webpage_url"] for vid in batch]))
+        decoded = [(vid, pcm) for vid, pcm in zip(batch, prefixes) if pcm]
+        languages = identify_languages_batch([pcm for _, pcm in decoded], language_id)
+        for (vid, _), language in zip(decoded, languages):
+            language_cache[vid["id"]] = language
+
+def get_rss_mb():
+    """Returns the resident memory of the current process in MB (0 if unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+def load_vosk_model(model_dir):
+    """Returns a resident Vosk model, loading it from disk only on first use."""
+    from vosk import Model
+    with _vosk_models_lock:
+        stats = _vosk_model_stats.setdefault(model_dir, {"loads": 0, "load_seconds": 0.0, "rss_mb": 0.0, "uses": 0})
+        stats["uses"] += 1
+        if model_dir in _vosk_models:
+            _vosk_models.move_to_end(model_dir)
+            return _vosk_models[model_dir]
         if not os.path.exists(model_dir):
             raise FileNotFoundError(f"Vosk model not found: {model_dir}")
+
+        print(f"🔄 Loading Vosk model: {model_dir}")
+        rss_before = get_rss_mb()
+        start = time.perf_counter()
         model = Model(model_dir)
-        wf = wave.open(wav_path, "rb")
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() not in [8000, 16000, 32000, 44100, 48000]:
-            raise ValueError("Audio must be WAV mono PCM with supported sample rate.")
-        rec = KaldiRecognizer(model, wf.getframerate())
-        rec.SetWords(True)
-        full_text = ""
+        load_seconds = time.perf_counter() - start
+        rss_mb = max(get_rss_mb() - rss_before, 0.0)
+        stats["loads"] += 1
+        stats["load_seconds"] += load_seconds
+        stats["rss_mb"] = rss_mb
+        print(f"✅ Vosk model loaded in {load_seconds:.1f}s (+{rss_mb:.0f} MB): {model_dir}")
+
+        _vosk_models[model_dir] = model
+        while len(_vosk_models) > max(VOSK_MODEL_CACHE_SIZE, 1):
+            evicted_dir, _ = _vosk_models.popitem(last=False)
+            print(f"♻️ Evicted Vosk model from memory: {evicted_dir}")
+        return model
+
+def report_vosk_models():
+    """Prints load time, memory and usage for every Vosk model loaded in this process."""
+    if not _vosk_model_stats:
+        return
+    print("📊 Vosk model usage:")
+    for model_dir, stats in _vosk_model_stats.items():
+        print(
+            f"   {model_dir}: loads={stats['loads']}, load_time={stats['load_seconds']:.1f}s, "
+            f"memory={stats['rss_mb']:.0f} MB, videos={stats['uses']}"
+        )
+
+def transcribe_pcm(chunks, model_dir, sample_rate=SAMPLE_RATE):
+    """Transcribes an iterable of mono PCM s16le chunks using Vosk."""
+    from vosk import KaldiRecognizer
+    model = load_vosk_model(model_dir)
+    rec = KaldiRecognizer(model, sample_rate)
+    rec.SetWords(True)
+    full_text = ""
+    audio_bytes = 0
+    input_wait = 0.0
+    chunks = iter(chunks)
+    with span("transcribe", model=os.path.basename(str(model_dir))) as metrics:
+        started = time.perf_counter()
         while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
+            # A streamed source downloads and decodes inside next(), which must not count as recognition
+            wait_start = time.perf_counter()
+            data = next(chunks, None)
+            input_wait += time.perf_counter() - wait_start
+            if data is None:
                 break
+            audio_bytes += len(data)
             if rec.AcceptWaveform(data):
                 result = json.loads(rec.Result())
                 full_text += result.get("text", "") + " "
         final_result = json.loads(rec.FinalResult())
         full_text += final_result.get("text", "")
+        metrics["audio_seconds"] = audio_bytes / (2 * sample_rate)
+        metrics["input_wait_s"] = round(input_wait, 4)
+        metrics["busy_s"] = round(time.perf_counter() - started - input_wait, 4)
+    return full_text.strip()
+
+def transcribe_vosk(wav_path, model_dir):
+    """Transcribes WAV audio using Vosk."""
+    try:
+        with wave.open(wav_path, "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() not in [8000, 16000, 32000, 44100, 48000]:
+                raise ValueError("Audio must be WAV mono PCM with supported sample rate.")
+            frames = iter(lambda: wf.readframes(4000), b"")
+            full_text = transcribe_pcm(frames, model_dir, wf.getframerate())
         print(f"✅ Transcription completed for {wav_path}")
-        return full_text.strip()
+        return full_text
     except Exception as e:
         print(f"❌ Transcription error: {e}")
         return ""
 
+def find_silence_splits(pcm, target_seconds=CHUNK_TARGET_SECONDS, max_seconds=CHUNK_MAX_SECONDS):
+    """Returns byte offsets at which to cut 16kHz mono PCM, placed in the longest silence of each window."""
+    import torch
+    frame_samples = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    samples = torch.frombuffer(bytearray(pcm[:len(pcm) - len(pcm) % 2]), dtype=torch.int16)
+    n_frames = len(samples) // frame_samples
+    if n_frames == 0:
+        return []
+    frames = samples[:n_frames * frame_samples].to(torch.float32).view(n_frames, frame_samples)
+    energy = frames.pow(2).mean(dim=1).sqrt()
+    threshold = max(VAD_MIN_SILENCE_RMS, 0.5 * float(energy.median()))
+    silent = (energy < threshold).tolist()
+
+    target_frames = int(target_seconds * 1000 / VAD_FRAME_MS)
+    max_frames = int(max_seconds * 1000 / VAD_FRAME_MS)
+    splits = []
+    start = 0
+    while n_frames - start > max_frames:
+        window_start, window_end = start + target_frames, start + max_frames
+        best_run, run_start, cut = 0, None, None
+        for i in range(window_start, window_end + 1):
+            if i < window_end and silent[i]:
+                if run_start is None:
+                    run_start = i
+                continue
+            if run_start is not None and i - run_start > best_run:
+                best_run, cut = i - run_start, (run_start + i) // 2
+            run_start = None
+        if cut is None:
+            cut = window_start + int(energy[window_start:window_end].argmin())
+        splits.append(cut * frame_samples * 2)
+        start = cut
+    return splits
+
+def split_on_silence(pcm, target_seconds=CHUNK_TARGET_SECONDS, max_seconds=CHUNK_MAX_SECONDS):
+    """Splits 16kHz mono PCM into segments that end in silence, so words are not cut in half."""
+    bounds = [0] + find_silence_splits(pcm, target_seconds, max_seconds) + [len(pcm)]
+    return [pcm[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def transcribe_segment(pcm, model_dir):
+    """Transcribes one in-memory PCM segment; used as a process-pool task."""
+    return transcribe_pcm(split_pcm(pcm), model_dir)
+
+def transcribe_pcm_chunked(pcm, model_dir, executor):
+    """Transcribes 16kHz mono PCM by splitting it at silences and recognizing the segments in parallel."""
+    segments = split_on_silence(pcm)
+    print(f"✂️ Split audio into {len(segments)} segments at silences.")
+    texts = executor.map(transcribe_segment, segments, [model_dir] * len(segments))
+    return " ".join(text for text in texts if text)
+
+def compare_chunked_transcription(wav_path, model_dir, workers):
+    """Times transcribe_vosk against chunked transcription on a local WAV and prints the speed-up."""
+    with wave.open(wav_path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+            print(f"❌ {wav_path} must be 16kHz mono PCM s16le.")
+            return None
+        pcm = wf.readframes(wf.getnframes())
+    audio_seconds = len(pcm) / (SAMPLE_RATE * 2)
+
+    load_vosk_model(model_dir)
+    start = time.perf_counter()
+    transcribe_vosk(wav_path, model_dir)
+    sequential_seconds = time.perf_counter() - start
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=load_vosk_model, initargs=(model_dir,)) as executor:
+        for future in [executor.submit(get_rss_mb) for _ in range(workers)]:
+            future.result()
+        start = time.perf_counter()
+        transcribe_pcm_chunked(pcm, model_dir, executor)
+        chunked_seconds = time.perf_counter() - start
+
+    speedup = sequential_seconds / chunked_seconds if chunked_seconds else 0.0
+    print(
+        f"📊 {audio_seconds:.0f}s of audio: sequential {sequential_seconds:.1f}s, "
+        f"chunked with {workers} workers {chunked_seconds:.1f}s, speed-up {speedup:.2f}x"
+    )
+    return {"audio_seconds": audio_seconds, "sequential_seconds": sequential_seconds,
+            "chunked_seconds": chunked_seconds, "workers": workers, "speedup": speedup}
+
 def download_model_files(repo_id, savedir):
-    """Downloads SpeechBrain model files from Hugging Face."""
-    files = ["hyperparams.yaml", "embedding_model.ckpt", "label_encoder.txt"]
+    """Downloads SpeechBrain model files from Hugging Face, skipping files already on disk."""
+    missing = [file for file in SPEECHBRAIN_FILES if not os.path.exists(os.path.join(savedir, file))]
+    if not missing:
+        print(f"✅ Using SpeechBrain model files in {savedir}")
+        return
+    from huggingface_hub import hf_hub_download
+    print("🔄 Downloading SpeechBrain model files...")
     os.makedirs(savedir, exist_ok=True)
-    for file in files:
+    for file in missing:
         hf_hub_download(repo_id=repo_id, filename=file, local_dir=savedir)
         print(f"✅ Downloaded {file} to {savedir}")
 
-def main():
+def load_language_id(model_dir):
+    """Loads the SpeechBrain language-ID model from its local directory."""
+    from speechbrain.pretrained import EncoderClassifier
+    return EncoderClassifier.from_hparams(source=model_dir)
+
+ACCEPTED_LANGUAGES = {"en", "hi", "te", "gu"}
+LANGUAGE_TO_MODEL = {
+    "en": VOSK_MODEL_EN,
+    "hi": VOSK_MODEL_HI,
+    "te": VOSK_MODEL_TE,
+    "gu": VOSK_MODEL_GU,
+}
+
+_worker_language_id = None
+model_daemon_client = None  # ModelDaemonClient set up by main() with --daemon; None runs the models in-process
+
+def process_video(vid, idx, language_id, language=None, segment_executor=None, audio_path=None):
+    """Streams, identifies and transcribes one video; returns (language, transcript) or None.
+
+    A known `language` (e.g. from the language cache) skips language identification. The transcript
+    is None when the language is not accepted. With a `segment_executor`, the audio is split at
+    silences and its segments are transcribed in parallel. A prefetched `audio_path` is decoded
+    instead of streaming the video, and removed afterwards.
+    """
+    print(f"\n▶ Processing Video #{idx}: {vid.get('title')}")
+    webpage_url = vid.get("webpage_url")
+    if not webpage_url and not audio_path:
+        print("❌ No webpage_url found; skipping.")
+        return None
+    if language is not None and language not in ACCEPTED_LANGUAGES:
+        print(f"❌ Language '{language}' not in accepted list (en, hi, te, gu). Skipping.")
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+        return language, None
+
+    chunks = decode_pcm(audio_path) if audio_path else stream_audio(webpage_url)
+    try:
+        prefix = read_pcm_prefix(chunks)
+        if not prefix:
+            print(f"❌ No audio decoded for {vid.get('title')}.")
+            return None
+
+        if language is None:
+            language = identify_language_pcm(prefix, language_id)
+            if language not in ACCEPTED_LANGUAGES:
+                print(f"❌ Language '{language}' not in accepted list (en, hi, te, gu). Skipping.")
+                return language, None
+        else:
+            print(f"🌐 Cached language: {language}")
+
+        model_dir_vosk = LANGUAGE_TO_MODEL.get(language)
+        if segment_executor:
+            with span("stream", part="rest") as metrics:
+                pcm = prefix + b"".join(chunks)
+                metrics["audio_seconds"] = (len(pcm) - len(prefix)) / (2 * SAMPLE_RATE)
+            transcript_text = transcribe_pcm_chunked(pcm, model_dir_vosk, segment_executor)
+        else:
+            transcript_text = transcribe_pcm(chain(split_pcm(prefix), chunks), model_dir_vosk)
+        print(f"✅ Transcription completed for video #{idx}")
+        return language, transcript_text
+    except Exception as e:
+        print(f"❌ Transcription error: {e}")
+        return None
+    finally:
+        chunks.close()
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+
+def init_worker(speechbrain_model_dir):
+    """Loads the language-ID model once per worker process; Vosk models warm up on first use."""
+    global _worker_language_id
+    _worker_language_id = load_language_id(speechbrain_model_dir)
+
+def process_video_in_worker(vid, idx, language=None, audio_path=None):
+    """Runs process_video inside a pool worker using that worker's warm models (or on the model daemon)."""
+    if model_daemon_client:
+        return model_daemon_client.process_video(vid, idx, language, audio_path)
+    try:
+        return process_video(vid, idx, _worker_language_id, language, audio_path=audio_path)
+    except Exception as e:
+        print(f"❌ Worker failed on video #{idx}: {e}")
+        return None
+
+def video_key(vid):
+    """Returns the identity used to deduplicate a video across searches."""
+    return vid.get("id") or vid.get("webpage_url")
+
+def plan_cities(df, max_results=200, search_concurrency=SEARCH_CONCURRENCY):
+    """Runs every city's search up front, concurrently; returns [(city query, filtered videos)] in CSV order."""
+    cities = [row["city"] + " real estate market" for _, row in df.iterrows()]
+    days_list = [int(row["days"]) for _, row in df.iterrows()]
+    print(f"\n▶ Searching for {len(cities)} cities ({search_concurrency} at a time)...")
+    search_results = search_many(cities, max_results, search_concurrency, days_list, min_duration=50)
+
+    city_plans = []
+    for city, days, results in zip(cities, days_list, search_results):
+        print(f"\n▶ City: {city} with days: {days}")
+        filtered_videos = filter_videos(results, days, min_duration=50)
+        if not filtered_videos:
+            print(f"❌ No suitable videos found for {city}.")
+        city_plans.append((city, filtered_videos))
+    return city_plans
+
+def dedupe_videos(city_plans):
+    """Merges all cities' videos by video ID and reports how much duplicate work is avoided."""
+    unique_videos = OrderedDict()
+    total = 0
+    for _, filtered_videos in city_plans:
+        for vid in filtered_videos:
+            key = video_key(vid)
+            if not key:
+                continue
+            total += 1
+            unique_videos.setdefault(key, vid)
+    duplicates = total - len(unique_videos)
+    print(
+        f"\n📋 Planned {total} videos across {len(city_plans)} cities: {len(unique_videos)} unique, "
+        f"{duplicates} duplicate downloads/transcriptions avoided."
+    )
+    return list(unique_videos.values())
+
+def transcribe_videos(videos, video_cache, language_id_dir=None, executor=None, segment_executor=None, lid_batch_size=0,
+                      download_concurrency=0, download_dir="downloads", workers=1):
+    """Transcribes each video once (reusing the cache); returns {video_key: (language, transcript)}.
+
+    The language-ID model in `language_id_dir` is loaded in this process only once an uncached video
+    actually needs its language identified, so runs served from the cache never import it.
+    """
+    cached = {vid["id"]: video_cache.get(vid["id"]) for vid in videos if vid.get("id")}
+    language_cache = {
+        video_id: entry["language"] for video_id, entry in cached.items() if entry and entry["language"]
+    }
+
+    outcomes = {}
+    pending = []
+    for idx, vid in enumerate(videos, start=1):
+        entry = cached.get(vid.get("id"))
+        if entry and (entry["transcript"] or entry["language"] and entry["language"] not in ACCEPTED_LANGUAGES):
+            print(f"♻️ Reusing cached result for Video #{idx}: {vid.get('title')}")
+            outcomes[video_key(vid)] = (entry["language"], entry["transcript"])
+            video_cache.record(hit=True)
+        else:
+            pending.append((idx, vid))
+            video_cache.record(hit=False)
+
+    language_id = None
+    if language_id_dir and any(vid.get("id") not in language_cache for _, vid in pending):
+        language_id = load_language_id(language_id_dir)
+        print("✅ Language identification model loaded.")
+    if lid_batch_size > 0 and language_id:
+        classify_videos([vid for _, vid in pending], language_id, language_cache, lid_batch_size)
+
+    if download_concurrency > 0:
+        results = transcribe_prefetched(
+            pending, language_cache, language_id, executor, segment_executor, download_concurrency, download_dir,
+            max_in_flight=2 * max(workers, 1)
+        )
+    elif executor:
+        futures = [
+            (vid, executor.submit(process_video_in_worker, vid, idx, language_cache.get(vid.get("id"))))
+            for idx, vid in pending
+        ]
+        results = [(vid, future.result()) for vid, future in futures]
+    else:
+        results = [
+            (vid, process_video(vid, idx, language_id, language_cache.get(vid.get("id")), segment_executor))
+            for idx, vid in pending
+        ]
+
+    for vid, outcome in results:
+        outcomes[video_key(vid)] = outcome
+        if outcome:
+            video_cache.put(vid, *outcome)
+        elif vid.get("id") in language_cache:
+            video_cache.put(vid, language_cache[vid["id"]])
+    return outcomes
+
+def transcribe_prefetched(pending, language_cache, language_id, executor, segment_executor,
+                          download_concurrency, download_dir, max_in_flight=2):
+    """Overlaps downloads with transcription: videos are transcribed in the order their audio arrives."""
+    results = []
+    to_download = []
+    for idx, vid in pending:
+        language = language_cache.get(vid.get("id"))
+        if language is not None and language not in ACCEPTED_LANGUAGES:
+            results.append((vid, process_video(vid, idx, language_id, language)))
+        else:
+            to_download.append((idx, vid))
+
+    indices = {video_key(vid): idx for idx, vid in to_download}
+    in_flight = []
+    for vid, audio_path in prefetch_audio([vid for _, vid in to_download], download_dir, download_concurrency):
+        if not audio_path:
+            results.append((vid, None))
+            continue
+        idx = indices[video_key(vid)]
+        language = language_cache.get(vid.get("id"))
+        if executor:
+            in_flight.append((vid, executor.submit(process_video_in_worker, vid, idx, language, audio_path)))
+            running = [future for _, future in in_flight if not future.done()]
+            while len(running) >= max_in_flight:
+                wait(running, return_when=FIRST_COMPLETED)
+                running = [future for future in running if not future.done()]
+        else:
+            results.append((vid, process_video(vid, idx, language_id, language, segment_executor, audio_path)))
+    results.extend((vid, future.result()) for vid, future in in_flight)
+    return results
+
+def parse_args(argv=None):
+    """Parses command-line options for the transcription stage."""
+    parser = argparse.ArgumentParser(description="Scrape and transcribe YouTube videos per city.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes transcribing videos in parallel (default: 1, serial).")
+    parser.add_argument("--lid-batch-size", type=int, default=0,
+                        help="Classify the language of uncached videos up front in batches of this size (default: 0, per video).")
+    parser.add_argument("--chunk-workers", type=int, default=1,
+                        help="Split each video at silences and transcribe the segments on this many processes (default: 1, off).")
+    parser.add_argument("--skip-update", action="store_true",
+                        help="Do not run 'yt-dlp -U' at startup.")
+    parser.add_argument("--search-concurrency", type=int, default=SEARCH_CONCURRENCY,
+                        help=f"Max YouTube searches running at once (default: {SEARCH_CONCURRENCY}).")
+    parser.add_argument("--download-concurrency", type=int, default=0,
+                        help="Download audio this many videos at a time, overlapping with transcription, instead of "
+                             f"streaming each video while it is transcribed (default: 0, streaming; e.g. {DOWNLOAD_CONCURRENCY}).")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"Directory of the video metadata/transcript cache (default: {CACHE_DIR}).")
+    parser.add_argument("--cache-max-mb", type=float, default=CACHE_MAX_MB,
+                        help=f"Evict least recently used transcripts beyond this size (default: {CACHE_MAX_MB}).")
+    parser.add_argument("--cache-max-age-days", type=float, default=CACHE_MAX_AGE_DAYS,
+                        help=f"Evict cached videos unused for this many days (default: {CACHE_MAX_AGE_DAYS}).")
+    parser.add_argument("--compare-chunked", metavar="WAV",
+                        help="Benchmark chunked against sequential transcription on a local 16kHz mono WAV and exit.")
+    parser.add_argument("--compare-language", default="en", choices=sorted(ACCEPTED_LANGUAGES),
+                        help="Vosk model language used with --compare-chunked (default: en).")
+    parser.add_argument("--daemon", nargs="?", const=DAEMON_SOCKET, metavar="SOCKET",
+                        help="Send videos to a running model_daemon.py, which keeps the language-ID and Vosk models "
+                             f"loaded, instead of loading them in this run (default socket: {DAEMON_SOCKET}).")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.workers > 1 and args.chunk_workers > 1:
+        parser.error("--workers and --chunk-workers cannot both be greater than 1.")
+    if args.daemon and args.chunk_workers > 1:
+        parser.error("--daemon and --chunk-workers cannot be combined.")
+    return args
+
+def main(argv=None):
     """Scrapes and transcribes YouTube videos for real estate analysis."""
-    update_yt_dlp()
+    global model_daemon_client
+    args = parse_args(argv)
+    instrumentation.setup(args)
+    if args.compare_chunked:
+        compare_chunked_transcription(args.compare_chunked, LANGUAGE_TO_MODEL[args.compare_language], max(args.chunk_workers, 2))
+        instrumentation.print_summary()
+        return
+    if not args.skip_update:
+        update_yt_dlp()
 
     csv_path = "city_locality_list.csv"
     if not os.path.exists(csv_path):
         print(f"❌ CSV file not found: {csv_path}")
         return
+    import pandas as pd
     df = pd.read_csv(csv_path)
     if "city" not in df.columns or "days" not in df.columns:
         print("❌ CSV must contain 'city' and 'days' columns.")
@@ -181,76 +699,70 @@ def main():
 
     output_dir = "test"
     os.makedirs(output_dir, exist_ok=True)
-    model_dir = os.path.join(output_dir, "speechbrain_model")
-    temp_dir = os.path.join(output_dir, "temp")
+    model_dir = SPEECHBRAIN_MODEL_DIR
     transcripts_dir = "transcripts"
     os.makedirs(model_dir, exist_ok=True)
-    os.makedirs(temp_dir, exist_ok=True)
     os.makedirs(transcripts_dir, exist_ok=True)
 
-    repo_id = "speechbrain/lang-id-voxlingua107-ecapa"
-    print(f"🔄 Downloading SpeechBrain model files...")
-    download_model_files(repo_id, model_dir)
-    language_id = EncoderClassifier.from_hparams(source=model_dir)
-    print("✅ Language identification model loaded.")
-
-    accepted_languages = {"en", "hi", "te", "gu"}
-    language_to_model = {
-        "en": VOSK_MODEL_EN,
-        "hi": VOSK_MODEL_HI,
-        "te": VOSK_MODEL_TE,
-        "gu": VOSK_MODEL_GU,
-    }
-    for lang, path in language_to_model.items():
-        if not os.path.exists(path):
-            print(f"⚠️ Warning: Vosk model path for '{lang}' not set or does not exist: {path}. Update in script.")
+    if args.daemon:
+        model_daemon_client = ModelDaemonClient(args.daemon)
+        if model_daemon_client.ping():
+            print(f"✅ Using the model daemon on {args.daemon}.")
+        else:
+            print(f"⚠️ No model daemon listening on {args.daemon}; loading models in this run.")
+            model_daemon_client = None
+    if not model_daemon_client:
+        download_model_files(SPEECHBRAIN_REPO_ID, model_dir)
+    elif args.lid_batch_size > 0:
+        print("⚠️ --lid-batch-size is ignored with --daemon; the daemon identifies each video's language.")
+        args.lid_batch_size = 0
 
-    transcription_paths = []
-    for index, row in df.iterrows():
-        city = row["city"] + " real estate market"
-        days = int(row["days"])
-        max_results = 200
+    video_cache = VideoCache(args.cache_dir)
 
-        print(f"\n▶ Processing City: {city} with days: {days}")
-        results = search_youtube(city, max_results)
-        filtered_videos = filter_videos(results, days, min_duration=50)
+    executor = None
+    segment_executor = None
+    if model_daemon_client:
+        executor = ThreadPoolExecutor(max_workers=max(args.workers, 1))
+    elif args.chunk_workers > 1:
+        segment_executor = ProcessPoolExecutor(max_workers=args.chunk_workers)
+        print(f"✅ Started {args.chunk_workers} segment transcription workers.")
+    elif args.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(model_dir,))
+        print(f"✅ Started {args.workers} transcription workers.")
+    # Only the in-process path needs the language-ID model here; it is loaded once a video needs it
+    language_id_dir = model_dir if not model_daemon_client and (args.workers <= 1 or args.lid_batch_size > 0) else None
 
-        if not filtered_videos:
-            print(f"❌ No suitable videos found for {city}.")
-            transcription_paths.append("")
-            continue
+    for lang, path in LANGUAGE_TO_MODEL.items():
+        if not os.path.exists(path):
+            print(f"⚠️ Warning: Vosk model path for '{lang}' not set or does not exist: {path}. Update in script.")
 
+    try:
+        city_plans = plan_cities(df, search_concurrency=args.search_concurrency)
+        unique_videos = dedupe_videos(city_plans)
+        outcomes = transcribe_videos(
+            unique_videos, video_cache, language_id_dir, executor, segment_executor, args.lid_batch_size,
+            args.download_concurrency, os.path.join(output_dir, "downloads"), args.workers
+        )
+    finally:
+        if executor:
+            executor.shutdown()
+        if segment_executor:
+            segment_executor.shutdown()
+        video_cache.evict(args.cache_max_mb, args.cache_max_age_days)
+        video_cache.report()
+        video_cache.close()
+
+    transcription_paths = []
+    for city, filtered_videos in city_plans:
         final_transcripts = []
-        languages = []
         for idx, vid in enumerate(filtered_videos, start=1):
-            print(f"\n▶ Processing Video #{idx}: {vid.get('title')}")
-            downloaded_audio = download_audio(vid, output_dir)
-            if not downloaded_audio:
-                continue
-
-            wav_path = os.path.join(output_dir, f"audio_{index}_{idx}.wav")
-            converted_wav = convert_to_wav(downloaded_audio, wav_path)
-            if not converted_wav:
-                continue
-
-            language = identify_language(wav_path, language_id, temp_dir)
-            if language not in accepted_languages:
-                print(f"❌ Language '{language}' not in accepted list (en, hi, te, gu). Skipping.")
-                if os.path.exists(wav_path):
-                    os.remove(wav_path)
+            outcome = outcomes.get(video_key(vid))
+            if not outcome:
                 continue
-
-            languages.append(language)
-            model_dir_vosk = language_to_model.get(language)
-            transcript_text = transcribe_vosk(wav_path, model_dir_vosk)
+            language, transcript_text = outcome
             if transcript_text:
                 final_transcripts.append(f"==== Video {idx} ({language}) ====\n{transcript_text}\n")
 
-            if os.path.exists(wav_path):
-                os.remove(wav_path)
-            if os.path.exists(downloaded_audio):
-                os.remove(downloaded_audio)
-
         if final_transcripts:
             transcript_filename = f"{sanitize_filename(city)}_transcript.txt"
             transcript_path = os.path.join(transcripts_dir, transcript_filename)
@@ -262,15 +774,11 @@ def main():
             print(f"❌ No transcripts generated for {city}.")
             transcription_paths.append("")
 
-        for temp_file in os.listdir(temp_dir):
-            os.remove(os.path.join(temp_dir, temp_file))
-
     df["transcription_path"] = transcription_paths
     df.to_csv(csv_path, index=False)
     print(f"✅ Updated CSV with transcription paths: {csv_path}")
-
-    if not os.listdir(temp_dir):
-        os.rmdir(temp_dir)
+    report_vosk_models()
+    instrumentation.print_summary()
 
 if __name__ == "__main__":
     main()
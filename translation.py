@@ -1,19 +1,137 @@
 import time
 import os
 import html
-import pyautogui
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from translation_cache import (
+    TranslationCache, TRANSLATION_CACHE_DIR, TRANSLATION_CACHE_TTL_DAYS, TRANSLATION_CACHE_MAX_MB, translation_key
+)
+from transcript_reader import iter_video_transcripts, video_header
+import instrumentation
+from instrumentation import span
+
+SEGMENT_WORDS = 80          # Transcripts have no punctuation, so they are translated in fixed word windows
+TRANSLATION_BATCH_SIZE = 16 # Segments per translate_batch call
+TRANSLATION_WORKERS = 4     # Videos of one file translated in parallel
+MARIAN_MODELS = {
+    "hi": "Helsinki-NLP/opus-mt-hi-en",
+    "mul": "Helsinki-NLP/opus-mt-mul-en",  # Fallback for languages without a dedicated model (te, gu, ...)
+}
+
+class Translator(ABC):
+    """Translates batches of text segments from one source language to English."""
+
+    @abstractmethod
+    def translate_batch(self, segments, source_lang):
+        """Returns the English translation of each segment."""
+
+    def close(self):
+        pass
+
+class MockTranslator(Translator):
+    """Offline stand-in for tests: tags each segment instead of translating it."""
+
+    def translate_batch(self, segments, source_lang):
+        return [f"[{source_lang}->en] {segment}" for segment in segments]
+
+class MarianTranslator(Translator):
+    """Offline on-CPU machine translation with Helsinki-NLP MarianMT models from Hugging Face."""
+
+    def __init__(self, device="cpu", max_length=512):
+        from transformers import MarianMTModel, MarianTokenizer
+        self._model_cls, self._tokenizer_cls = MarianMTModel, MarianTokenizer
+        self.device = device
+        self.max_length = max_length
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def _load(self, source_lang):
+        name = MARIAN_MODELS.get(source_lang, MARIAN_MODELS["mul"])
+        with self.lock:
+            if name not in self.models:
+                print(f"🔄 Loading translation model {name}...")
+                tokenizer = self._tokenizer_cls.from_pretrained(name)
+                model = self._model_cls.from_pretrained(name).to(self.device).eval()
+                self.models[name] = (tokenizer, model)
+        return self.models[name]
+
+    def translate_batch(self, segments, source_lang):
+        import torch
+        tokenizer, model = self._load(source_lang)
+        inputs = tokenizer(segments, return_tensors="pt", padding=True, truncation=True, max_length=self.max_length)
+        with torch.no_grad():
+            outputs = model.generate(**inputs.to(self.device), max_length=self.max_length)
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+class ChromeTranslator(Translator):
+    """Legacy backend: Chrome's built-in page translation driven through Selenium and pyautogui.
+
+    Needs a visible browser window, so calls are serialized.
+    """
+
+    def __init__(self):
+        self.driver = setup_driver()
+        self.lock = threading.Lock()
+
+    def translate_batch(self, segments, source_lang):
+        html_path = f"temp_{threading.get_ident()}.html"
+        with self.lock:
+            try:
+                create_html_page("\n".join(segments), html_path)
+                english_text = translate_text(self.driver, html_path)
+            finally:
+                if os.path.exists(html_path):
+                    os.remove(html_path)
+        if not english_text:
+            raise RuntimeError("Chrome translation failed.")
+        lines = [line for line in english_text.split("\n") if line.strip()]
+        # Chrome may merge lines; translate_video_text only needs the text in order
+        return lines if len(lines) == len(segments) else [" ".join(lines)]
+
+    def close(self):
+        self.driver.quit()
+
+TRANSLATORS = {"marian": MarianTranslator, "chrome": ChromeTranslator, "mock": MockTranslator}
+
+def make_translator(backend):
+    """Creates the translation backend registered under `backend`."""
+    return TRANSLATORS[backend]()
+
+def split_segments(text, words_per_segment=SEGMENT_WORDS):
+    """Splits unpunctuated transcript text into segments of at most words_per_segment words."""
+    words = text.split()
+    return [" ".join(words[i:i + words_per_segment]) for i in range(0, len(words), words_per_segment)]
+
+def translate_video_text(text, source_lang, translator, batch_size=TRANSLATION_BATCH_SIZE):
+    """Translates one video's transcript segment by segment, batch_size segments per backend call."""
+    segments = split_segments(text)
+    translated = []
+    with span("translate", language=source_lang, backend=type(translator).__name__, segments=len(segments)):
+        for start in range(0, len(segments), batch_size):
+            translated.extend(translator.translate_batch(segments[start:start + batch_size], source_lang))
+    return " ".join(t.strip() for t in translated if t.strip())
+
+def translate_video(text, source_lang, translator, cache=None, backend=""):
+    """Translates one non-English video's transcript, reusing the cached translation of identical text."""
+    key = translation_key(text, source_lang, backend) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    translated = translate_video_text(text, source_lang or "mul", translator)
+    if cache:
+        cache.put(key, translated)
+    return translated
 
 def setup_driver():
     """Sets up Selenium WebDriver with Chrome."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
     options = Options()
     options.add_argument("--lang=en")
     options.add_argument("--start-maximized")
@@ -25,7 +143,7 @@ def create_html_page(text, html_path):
     html_content = f"""
     <html lang="hi">
     <head><meta charset="UTF-8"></head>
-    <body><div id="text-to-translate">{html.escape(text)}</div></body>
+    <body><div id="text-to-translate" style="white-space: pre-line">{html.escape(text)}</div></body>
     </html>
     """
     with open(html_path, "w", encoding="utf-8") as f:
@@ -33,6 +151,11 @@ def create_html_page(text, html_path):
 
 def translate_text(driver, html_path):
     """Opens the HTML file in Chrome and translates to English."""
+    import pyautogui
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.common.action_chains import ActionChains
     driver.get("file://" + os.path.abspath(html_path))
     try:
         element = WebDriverWait(driver, 10).until(
@@ -51,32 +174,85 @@ def translate_text(driver, html_path):
         print(f"❌ Translation failed: {e}")
         return None
 
-def translate_text_file(input_txt, output_txt):
-    """Translates a text file to English using Chrome."""
-    driver = setup_driver()
-    html_path = "temp.html"
-    try:
-        with open(input_txt, "r", encoding="utf-8") as f:
-            original_text = f.read()
-        print(f"🔄 Creating HTML file for translation: {input_txt}")
-        create_html_page(original_text, html_path)
-        print(f"🔄 Translating: {input_txt}")
-        english_text = translate_text(driver, html_path)
-        if english_text:
-            with open(output_txt, "w", encoding="utf-8") as f:
-                f.write(english_text)
-            print(f"✅ Translation saved to: {output_txt}")
-            return output_txt
-        else:
-            print(f"❌ Translation failed for {input_txt}.")
+def translate_text_file(input_txt, output_txt, translator, workers=TRANSLATION_WORKERS, cache=None, backend=""):
+    """Translates a transcript file to English video by video, leaving English videos untouched.
+
+    With a cache, each video's translation is reused whenever the same text in the same language
+    was already translated by this backend, so re-runs and overlapping cities only translate new videos.
+    """
+    def translate_block(video_index, language, body):
+        if language == "en" or not body:
+            return body
+        try:
+            return translate_video(body, language, translator, cache, backend)
+        except Exception as e:
+            print(f"❌ Translation failed for {video_header(video_index, language)}: {e}")
             return None
-    finally:
-        driver.quit()
-        if os.path.exists(html_path):
-            os.remove(html_path)
 
-def main():
+    # Videos are submitted as the reader reaches them and written back in order, with at most
+    # 2 * workers in flight, so memory stays bounded however large the transcript file is.
+    print(f"🔄 Translating videos in {input_txt}...")
+    partial_txt = output_txt + ".part"
+    pending = deque()
+    videos = translated = 0
+    failed = False
+    with open(partial_txt, "w", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        def write_next():
+            nonlocal videos
+            video_index, language, future = pending.popleft()
+            body = future.result()
+            if body is None:
+                return False
+            if videos:
+                out.write("\n")
+            out.write(f"{video_header(video_index, language)}\n{body}\n")
+            videos += 1
+            return True
+
+        for video_index, language, body in iter_video_transcripts(input_txt):
+            pending.append((video_index, language, pool.submit(translate_block, video_index, language, body)))
+            translated += language != "en"
+            if len(pending) > 2 * max(workers, 1) and not write_next():
+                failed = True
+                break
+        while pending and not failed:
+            failed = not write_next()
+        if failed:
+            pool.shutdown(cancel_futures=True)
+
+    if failed or not videos:
+        os.remove(partial_txt)
+        if failed:
+            print(f"❌ Translation failed for {input_txt}.")
+        else:
+            print(f"❌ No '==== Video N ====' blocks found in {input_txt}.")
+        return None
+    os.replace(partial_txt, output_txt)
+    print(f"✅ Translation saved to: {output_txt} ({translated} of {videos} videos translated)")
+    return output_txt
+
+def parse_args(argv=None):
+    """Parses command-line options for the translation stage."""
+    parser = argparse.ArgumentParser(description="Translate non-English video transcripts to English.")
+    parser.add_argument("--backend", choices=sorted(TRANSLATORS), default="marian",
+                        help="Translation backend: offline MarianMT on CPU, legacy Chrome, or a mock for tests (default: marian).")
+    parser.add_argument("--workers", type=int, default=TRANSLATION_WORKERS,
+                        help=f"Videos of one file translated in parallel (default: {TRANSLATION_WORKERS}).")
+    parser.add_argument("--translation-cache-dir", default=TRANSLATION_CACHE_DIR,
+                        help=f"Directory for the per-video translation cache (default: {TRANSLATION_CACHE_DIR}).")
+    parser.add_argument("--translation-cache-ttl-days", type=float, default=TRANSLATION_CACHE_TTL_DAYS,
+                        help=f"Cached translations older than this are translated again (default: {TRANSLATION_CACHE_TTL_DAYS}).")
+    parser.add_argument("--translation-cache-max-mb", type=float, default=TRANSLATION_CACHE_MAX_MB,
+                        help=f"Evict least recently used translations beyond this size (default: {TRANSLATION_CACHE_MAX_MB}).")
+    parser.add_argument("--no-translation-cache", action="store_true",
+                        help="Translate every non-English video again instead of reusing cached translations.")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Processes transcripts for translation."""
+    args = parse_args(argv)
+    instrumentation.setup(args)
     transcripts_dir = "transcripts"
     translated_dir = "translated"
     csv_path = "city_locality_list.csv"
@@ -85,27 +261,40 @@ def main():
     if not os.path.exists(csv_path):
         print(f"❌ CSV file not found: {csv_path}")
         return
+    import pandas as pd
     df = pd.read_csv(csv_path)
     if "transcription_path" not in df.columns:
         print("❌ CSV must contain 'transcription_path' column.")
         return
 
+    translator = make_translator(args.backend)
+    cache = None if args.no_translation_cache else TranslationCache(
+        args.translation_cache_dir, args.translation_cache_ttl_days, args.translation_cache_max_mb
+    )
     translated_paths = []
-    for index, row in df.iterrows():
-        input_txt = row["transcription_path"]
-        if not input_txt or not os.path.exists(input_txt):
-            print(f"⚠️ Skipping row {index}: '{input_txt}' invalid.")
-            translated_paths.append("")
-            continue
-        filename = os.path.basename(input_txt)
-        output_txt = os.path.join(translated_dir, filename)
-        print(f"\n▶ Translating: {input_txt}")
-        translated_path = translate_text_file(input_txt, output_txt)
-        translated_paths.append(translated_path if translated_path else "")
+    try:
+        for index, row in df.iterrows():
+            input_txt = row["transcription_path"]
+            if not isinstance(input_txt, str) or not input_txt or not os.path.exists(input_txt):
+                print(f"⚠️ Skipping row {index}: '{input_txt}' invalid.")
+                translated_paths.append("")
+                continue
+            filename = os.path.basename(input_txt)
+            output_txt = os.path.join(translated_dir, filename)
+            print(f"\n▶ Translating: {input_txt}")
+            translated_path = translate_text_file(input_txt, output_txt, translator, args.workers, cache, args.backend)
+            translated_paths.append(translated_path if translated_path else "")
+    finally:
+        translator.close()
+        if cache:
+            cache.evict()
+            cache.report()
+            cache.close()
 
     df["translated_path"] = translated_paths
     df.to_csv(csv_path, index=False)
     print(f"✅ Updated CSV with translated paths: {csv_path}")
+    instrumentation.print_summary()
 
 if __name__ == "__main__":
     main()
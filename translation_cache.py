@@ -0,0 +1,29 @@
+import hashlib
+from llm_cache import LLMCache
+
+TRANSLATION_CACHE_DIR = "cache"
+TRANSLATION_CACHE_TTL_DAYS = 90   # Translations older than this are treated as misses and evicted
+TRANSLATION_CACHE_MAX_MB = 200    # Least recently used translations beyond this size are evicted
+
+def translation_key(text, source_lang, backend):
+    """Returns a hash of a video's transcript text, its language and the backend translating it."""
+    payload = "\0".join([backend, source_lang or "", text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class TranslationCache(LLMCache):
+    """SQLite cache of per-video translations keyed by translation_key, evicted like the LLM cache."""
+
+    FILENAME = "translations.sqlite3"
+    NAME = "translation cache"
+
+    def __init__(self, cache_dir=TRANSLATION_CACHE_DIR, ttl_days=TRANSLATION_CACHE_TTL_DAYS,
+                 max_mb=TRANSLATION_CACHE_MAX_MB):
+        super().__init__(cache_dir, ttl_days, max_mb)
+        self.conn.execute("DROP TABLE IF EXISTS translations")  # Unbounded table of earlier versions
+        self.conn.commit()
+
+    def report(self):
+        """Prints how many video translations were reused in this run."""
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        print(f"📊 Translation cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)")
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+CACHE_DIR = "cache"
+CACHE_MAX_MB = 500        # Transcript blobs beyond this size are evicted, least recently used first
+CACHE_MAX_AGE_DAYS = 90   # Entries not used for this many days are evicted
+METADATA_FIELDS = ("id", "title", "webpage_url", "upload_date", "duration", "channel")
+
+class VideoCache:
+    """SQLite index of video metadata and detected language, with content-addressed transcript blobs.
+
+    Safe to share between threads, e.g. the stages of pipeline.py.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "transcripts")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "videos.sqlite3"), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS videos (
+                video_id TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                language TEXT,
+                transcript_hash TEXT,
+                transcript_bytes INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.txt")
+
+    def get(self, video_id):
+        """Returns {'metadata', 'language', 'transcript'} for a cached video, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT metadata, language, transcript_hash FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            metadata, language, digest = row
+            transcript = None
+            if digest:
+                try:
+                    with open(self._blob_path(digest), "r", encoding="utf-8") as f:
+                        transcript = f.read()
+                except OSError:
+                    transcript = None
+            self.conn.execute("UPDATE videos SET accessed_at = ? WHERE video_id = ?", (time.time(), video_id))
+            self.conn.commit()
+            return {"metadata": json.loads(metadata), "language": language, "transcript": transcript}
+
+    def put(self, video_data, language, transcript=None):
+        """Stores a video's metadata, detected language and (optionally) its transcript."""
+        video_id = video_data.get("id")
+        if not video_id:
+            return
+        metadata = json.dumps({k: video_data.get(k) for k in METADATA_FIELDS}, ensure_ascii=False)
+        digest = None
+        size = 0
+        if transcript:
+            data = transcript.encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+            size = len(data)
+            path = self._blob_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        with self.lock:
+            now = time.time()
+            old = self.conn.execute("SELECT transcript_hash FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            self.conn.execute(
+                """INSERT INTO videos (video_id, metadata, language, transcript_hash, transcript_bytes, created_at, accessed_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(video_id) DO UPDATE SET
+                       metadata = excluded.metadata,
+                       language = excluded.language,
+                       transcript_hash = COALESCE(excluded.transcript_hash, videos.transcript_hash),
+                       transcript_bytes = CASE WHEN excluded.transcript_hash IS NULL
+                                               THEN videos.transcript_bytes ELSE excluded.transcript_bytes END,
+                       accessed_at = excluded.accessed_at""",
+                (video_id, metadata, language, digest, size, now, now),
+            )
+            self.conn.commit()
+            if old and old[0] and digest and old[0] != digest:
+                self._remove_blob_if_unused(old[0])
+
+    def record(self, hit):
+        """Counts one cache lookup as a hit or a miss for the end-of-run summary."""
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _remove_blob_if_unused(self, digest):
+        in_use = self.conn.execute("SELECT 1 FROM videos WHERE transcript_hash = ? LIMIT 1", (digest,)).fetchone()
+        if not in_use and os.path.exists(self._blob_path(digest)):
+            os.remove(self._blob_path(digest))
+
+    def total_bytes(self):
+        """Returns the size of all distinct transcript blobs referenced by the index."""
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(b), 0) FROM (SELECT MAX(transcript_bytes) AS b FROM videos "
+            "WHERE transcript_hash IS NOT NULL GROUP BY transcript_hash)"
+        ).fetchone()
+        return row[0]
+
+    def evict(self, max_mb=CACHE_MAX_MB, max_age_days=CACHE_MAX_AGE_DAYS):
+        """Drops entries unused for max_age_days, then least recently used ones until under max_mb."""
+        cutoff = time.time() - max_age_days * 86400
+        stale = self.conn.execute(
+            "SELECT video_id, transcript_hash FROM videos WHERE accessed_at < ?", (cutoff,)
+        ).fetchall()
+        evicted = self._delete(stale)
+
+        max_bytes = max_mb * 1024 * 1024
+        if self.total_bytes() > max_bytes:
+            rows = self.conn.execute(
+                "SELECT video_id, transcript_hash FROM videos WHERE transcript_hash IS NOT NULL ORDER BY accessed_at"
+            ).fetchall()
+            for row in rows:
+                if self.total_bytes() <= max_bytes:
+                    break
+                evicted += self._delete([row])
+        if evicted:
+            print(f"♻️ Evicted {evicted} videos from cache.")
+        return evicted
+
+    def _delete(self, rows):
+        for video_id, _ in rows:
+            self.conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+        self.conn.commit()
+        for digest in {digest for _, digest in rows if digest}:
+            self._remove_blob_if_unused(digest)
+        return len(rows)
+
+    def report(self):
+        """Prints the hit/miss summary for this run and the current cache size."""
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        entries = self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+        print(
+            f"📊 Video cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), "
+            f"{entries} videos, {self.total_bytes() / (1024 * 1024):.1f} MB of transcripts"
+        )
+
+    def close(self):
+        self.conn.close()